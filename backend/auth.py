@@ -1,5 +1,7 @@
+import asyncio
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Tuple
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status, Request
@@ -30,6 +32,18 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+# bcrypt is deliberately slow (~100ms+) and releases the GIL, so request
+# handlers run it in a worker thread instead of stalling the event loop.
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against a hash without blocking the event loop"""
+    return await asyncio.to_thread(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password without blocking the event loop"""
+    return await asyncio.to_thread(get_password_hash, password)
+
+
 def create_access_token(data: dict, tenant_id: int, branch_id: Optional[int] = None, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token with tenant and branch context"""
     to_encode = data.copy()
@@ -47,12 +61,47 @@ def create_access_token(data: dict, tenant_id: int, branch_id: Optional[int] = N
     return encoded_jwt
 
 
+# ==================== SUBDOMAIN CACHE ====================
+# Per-process cache of subdomain -> tenant id (None when the subdomain is
+# free). Only ids are cached - Tenant rows are still loaded through the
+# request's session - and misses expire quickly since signups claim names.
+# Endpoints that create or delete tenants call invalidate_subdomain_cache().
+SUBDOMAIN_CACHE_TTL_SECONDS = 30
+SUBDOMAIN_MISS_CACHE_TTL_SECONDS = 5
+_subdomain_cache: Dict[str, Tuple[float, Optional[int]]] = {}
+
+
+async def get_tenant_id_from_subdomain(subdomain: str, db: AsyncSession) -> Optional[int]:
+    """Resolve a subdomain to its tenant id, served from cache when fresh"""
+    cached = _subdomain_cache.get(subdomain)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    tenant_id = await db.scalar(
+        select(Tenant.id).where(Tenant.subdomain == subdomain)
+    )
+    ttl = SUBDOMAIN_CACHE_TTL_SECONDS if tenant_id is not None else SUBDOMAIN_MISS_CACHE_TTL_SECONDS
+    _subdomain_cache[subdomain] = (time.monotonic() + ttl, tenant_id)
+    return tenant_id
+
+
+def invalidate_subdomain_cache(subdomain: str) -> None:
+    """Drop the cached resolution of a subdomain"""
+    _subdomain_cache.pop(subdomain, None)
+
+
 async def get_tenant_from_subdomain(subdomain: str, db: AsyncSession) -> Optional[Tenant]:
     """Resolve tenant from subdomain"""
-    result = await db.execute(
-        select(Tenant).where(Tenant.subdomain == subdomain)
-    )
-    tenant = result.scalar_one_or_none()
+    tenant_id = await get_tenant_id_from_subdomain(subdomain, db)
+    if tenant_id is None:
+        return None
+
+    tenant = await db.get(Tenant, tenant_id)
+    if tenant is None or tenant.subdomain != subdomain:
+        # Stale entry (tenant deleted since it was cached) - resolve again
+        invalidate_subdomain_cache(subdomain)
+        tenant_id = await get_tenant_id_from_subdomain(subdomain, db)
+        tenant = await db.get(Tenant, tenant_id) if tenant_id is not None else None
     return tenant
 
 
@@ -76,7 +125,7 @@ async def get_current_user(
     
     result = await db.execute(
         select(User)
-        .options(selectinload(User.tenants))
+        .options(selectinload(User.tenants).selectinload(Tenant.parent_tenant))
         .where(User.username == username)
     )
     user = result.scalar_one_or_none()
@@ -112,10 +161,8 @@ async def get_current_tenant_from_token(
     except JWTError:
         raise credentials_exception
     
-    result = await db.execute(
-        select(Tenant).where(Tenant.id == tenant_id)
-    )
-    tenant = result.scalar_one_or_none()
+    # Identity-map lookup: get_current_user usually loaded this tenant already
+    tenant = await db.get(Tenant, tenant_id)
     
     if tenant is None:
         raise HTTPException(status_code=404, detail="Tenant not found")
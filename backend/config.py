@@ -58,6 +58,9 @@ class Settings(BaseSettings):
     R2_SECRET_ACCESS_KEY: str
     R2_BUCKET_NAME: str
     R2_PUBLIC_URL: str | None = None
+    # Resize logos on demand via Cloudflare Image Resizing instead of storing a
+    # _display variant (needs R2_PUBLIC_URL on a custom domain with resizing on)
+    R2_IMAGE_RESIZING: bool = False
 
     # LiteLLM AI Configuration
     ANTHROPIC_API_KEY: str = ""  # LiteLLM uses this for Anthropic models
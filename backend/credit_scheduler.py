@@ -21,7 +21,7 @@ from models import (
     CreditTransaction, CreditTransactionStatus,
     ReminderLog, Customer, Tenant
 )
-from email_service import EmailService
+from email_service import email_service
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -37,7 +37,6 @@ async def check_and_send_credit_reminders():
     logger.info("🔍 Starting credit reminder check...")
 
     async with async_session_maker() as db:
-        email_service = EmailService()
         today = date.today()
 
         # Find all non-paid credit transactions with customer and tenant loaded
@@ -30,11 +30,17 @@ connect_args = {}
 if DATABASE_URL.startswith("sqlite"):
     connect_args = {"check_same_thread": False}
 
+# Rows per multi-row INSERT when an executemany goes through SQLAlchemy's
+# "insertmanyvalues" path (on by default for asyncpg and aiosqlite); batches
+# are also capped by each driver's bind-parameter limit
+INSERTMANYVALUES_PAGE_SIZE = 1000
+
 engine = create_async_engine(
     DATABASE_URL, 
     echo=True, 
     future=True,
-    connect_args=connect_args
+    connect_args=connect_args,
+    insertmanyvalues_page_size=INSERTMANYVALUES_PAGE_SIZE
 )
 async_session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
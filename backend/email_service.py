@@ -6,6 +6,7 @@ Uses Postmark HTTP API for email delivery.
 import httpx
 import logging
 from html import escape
+from typing import Optional
 from config import settings
 
 logger = logging.getLogger(__name__)
@@ -523,6 +524,23 @@ class EmailService:
         self.from_name = settings.POSTMARK_FROM_NAME
         self.enabled = settings.POSTMARK_ENABLED
         self.test_mode = settings.EMAIL_TEST_MODE
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Shared HTTP/2 client so sends reuse keep-alive connections to Postmark"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=30.0,
+                limits=httpx.Limits(max_keepalive_connections=50, max_connections=100)
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP client (called on app shutdown)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     async def send_email(
         self,
@@ -596,23 +614,23 @@ class EmailService:
 
             print(f"Sending email to {to_email} via Postmark...")
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.POSTMARK_API_URL,
-                    headers=headers,
-                    json=payload,
-                    timeout=30.0
-                )
-
-                if response.status_code == 200:
-                    logger.info(f"Email sent successfully to {to_email}")
-                    print(f"Email sent successfully to {to_email}")
-                    return True
-                else:
-                    error_detail = response.text
-                    logger.error(f"Postmark API error for {to_email}: {response.status_code} - {error_detail}")
-                    print(f"ERROR: Postmark API error: {response.status_code} - {error_detail}")
-                    return False
+            client = self._get_client()
+            response = await client.post(
+                self.POSTMARK_API_URL,
+                headers=headers,
+                json=payload,
+                timeout=30.0
+            )
+
+            if response.status_code == 200:
+                logger.info(f"Email sent successfully to {to_email}")
+                print(f"Email sent successfully to {to_email}")
+                return True
+            else:
+                error_detail = response.text
+                logger.error(f"Postmark API error for {to_email}: {response.status_code} - {error_detail}")
+                print(f"ERROR: Postmark API error: {response.status_code} - {error_detail}")
+                return False
 
         except httpx.TimeoutException:
             logger.error(f"Timeout sending email to {to_email}")
@@ -1391,3 +1409,7 @@ If you believe this is an error, please contact {business_name} directly.
             html_content=html_content,
             plain_content=plain_content
         )
+
+
+# Initialize service (shared so sends reuse one connection pool)
+email_service = EmailService()
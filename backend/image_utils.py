@@ -9,7 +9,7 @@ import io
 import time
 import asyncio
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 from r2_client import get_r2_client
 from config import settings
 from botocore.exceptions import ClientError
@@ -26,6 +26,9 @@ MAX_DIMENSION = 4000  # Maximum width or height in pixels
 THUMBNAIL_SIZE = (300, 300)  # For POS cards and inventory grid
 OPTIMIZED_SIZE = (800, 800)  # For detail views
 
+# Presigned logo uploads
+LOGO_UPLOAD_URL_EXPIRES_SECONDS = 300
+
 
 def validate_image_file(file: UploadFile) -> None:
     """
@@ -149,6 +152,35 @@ async def upload_to_r2(file_data: bytes, object_key: str, content_type: str = 'i
         )
 
 
+async def delete_many_from_r2(object_keys: List[str]):
+    """
+    Delete several objects from R2 in a single DeleteObjects request.
+
+    Args:
+        object_keys: Exact R2 object keys to delete (up to 1000)
+
+    Note: Missing keys are not an error - S3 reports them as deleted
+    """
+    if not object_keys:
+        return
+
+    try:
+        async with get_r2_client() as client:
+            response = await client.delete_objects(
+                Bucket=settings.R2_BUCKET_NAME,
+                Delete={
+                    'Objects': [{'Key': key} for key in object_keys],
+                    'Quiet': True  # Only report failures
+                }
+            )
+            for error in response.get('Errors', []):
+                if error.get('Code') != 'NoSuchKey':
+                    print(f"Warning: Failed to delete {error.get('Key')}: {error.get('Message')}")
+
+    except Exception as e:
+        print(f"Warning: Error during R2 deletion: {e}")
+
+
 async def delete_from_r2(object_key_pattern: str):
     """
     Delete file and its variants from R2.
@@ -159,33 +191,15 @@ async def delete_from_r2(object_key_pattern: str):
 
     Note: Deletes original, _optimized, and _thumb variants
     """
-    try:
-        async with get_r2_client() as client:
-            # Generate all variant keys
-            base_path = object_key_pattern.rsplit('.', 1)[0]  # Remove extension
-            extension = object_key_pattern.rsplit('.', 1)[1] if '.' in object_key_pattern else 'jpg'
-
-            variants = [
-                object_key_pattern,  # Original
-                f"{base_path}_optimized.{extension}",
-                f"{base_path}_thumb.{extension}"
-            ]
-
-            # Delete all variants
-            for key in variants:
-                try:
-                    await client.delete_object(
-                        Bucket=settings.R2_BUCKET_NAME,
-                        Key=key
-                    )
-                    print(f"Deleted R2 object: {key}")
-                except ClientError as e:
-                    # Ignore if object doesn't exist
-                    if e.response['Error']['Code'] != 'NoSuchKey':
-                        print(f"Warning: Failed to delete {key}: {e}")
+    # Generate all variant keys
+    base_path = object_key_pattern.rsplit('.', 1)[0]  # Remove extension
+    extension = object_key_pattern.rsplit('.', 1)[1] if '.' in object_key_pattern else 'jpg'
 
-    except Exception as e:
-        print(f"Warning: Error during R2 deletion: {e}")
+    await delete_many_from_r2([
+        object_key_pattern,  # Original
+        f"{base_path}_optimized.{extension}",
+        f"{base_path}_thumb.{extension}"
+    ])
 
 
 async def process_and_upload_product_image(
@@ -314,6 +328,61 @@ async def process_and_upload_product_image(
     return base_path
 
 
+def create_logo_variants(image: Image.Image) -> dict:
+    """
+    Encode the original and 400x400 display variants of a business logo.
+
+    The display variant is skipped when R2_IMAGE_RESIZING is on, since
+    Cloudflare then resizes the original on demand.
+
+    Args:
+        image: PIL Image object
+
+    Returns:
+        dict: JPEG bytes keyed by variant name ('original', 'display')
+    """
+    # Prepare image (convert RGBA to RGB if needed)
+    if image.mode == 'RGBA':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[3])
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    variants = {}
+
+    # Original variant - High quality, preserve dimensions
+    original_buffer = io.BytesIO()
+    image.save(
+        original_buffer,
+        format='JPEG',
+        quality=95,
+        optimize=True,
+        progressive=True
+    )
+    variants['original'] = original_buffer.getvalue()
+
+    if settings.R2_IMAGE_RESIZING:
+        return variants
+
+    # Display variant - 400x400px, maintain aspect ratio
+    display_size = (400, 400)
+    display_image = image.copy()
+    display_image.thumbnail(display_size, Image.Resampling.LANCZOS)
+
+    display_buffer = io.BytesIO()
+    display_image.save(
+        display_buffer,
+        format='JPEG',
+        quality=90,
+        optimize=True,
+        progressive=True
+    )
+    variants['display'] = display_buffer.getvalue()
+
+    return variants
+
+
 async def process_and_upload_logo(
     file: UploadFile,
     tenant_id: int,
@@ -324,7 +393,7 @@ async def process_and_upload_logo(
 
     Creates 2 variants:
     - Original: Full resolution, quality 95
-    - Display: 400x400px, quality 90
+    - Display: 400x400px, quality 90 (not stored with R2_IMAGE_RESIZING)
 
     Args:
         file: Uploaded file from FastAPI
@@ -389,42 +458,8 @@ async def process_and_upload_logo(
     base_filename = f"logo_{timestamp}"
     output_ext = ".jpg"  # Always convert to JPEG for consistency
 
-    # 4. Prepare image (convert RGBA to RGB if needed)
-    if image.mode == 'RGBA':
-        background = Image.new('RGB', image.size, (255, 255, 255))
-        background.paste(image, mask=image.split()[3])
-        image = background
-    elif image.mode != 'RGB':
-        image = image.convert('RGB')
-
-    # 5. Create variants
-    variants = {}
-
-    # Original variant - High quality, preserve dimensions
-    original_buffer = io.BytesIO()
-    image.save(
-        original_buffer,
-        format='JPEG',
-        quality=95,
-        optimize=True,
-        progressive=True
-    )
-    variants['original'] = original_buffer.getvalue()
-
-    # Display variant - 400x400px, maintain aspect ratio
-    display_size = (400, 400)
-    display_image = image.copy()
-    display_image.thumbnail(display_size, Image.Resampling.LANCZOS)
-
-    display_buffer = io.BytesIO()
-    display_image.save(
-        display_buffer,
-        format='JPEG',
-        quality=90,
-        optimize=True,
-        progressive=True
-    )
-    variants['display'] = display_buffer.getvalue()
+    # 4-5. Create variants
+    variants = create_logo_variants(image)
 
     # 6. Construct R2 paths
     base_path = f"logos/tenant_{tenant_id}/{base_filename}{output_ext}"
@@ -441,31 +476,149 @@ async def process_and_upload_logo(
     )
 
     # Upload display variant
-    display_path = f"logos/tenant_{tenant_id}/{base_filename}_display{output_ext}"
-    upload_tasks.append(
-        upload_to_r2(
-            file_data=variants['display'],
-            object_key=display_path,
-            content_type='image/jpeg'
+    if 'display' in variants:
+        display_path = f"logos/tenant_{tenant_id}/{base_filename}_display{output_ext}"
+        upload_tasks.append(
+            upload_to_r2(
+                file_data=variants['display'],
+                object_key=display_path,
+                content_type='image/jpeg'
+            )
         )
-    )
 
     # 7. Upload all variants to R2
     await asyncio.gather(*upload_tasks)
 
     # 8. Clean up old logo if exists
     if old_logo_url:
-        try:
-            # Delete both variants of old logo
-            old_base = old_logo_url.replace('.jpg', '').replace('.png', '').replace('.jpeg', '')
-            old_ext = '.jpg'  # Assume jpg since we always save as jpg
-
-            delete_tasks = [
-                delete_from_r2(f"{old_base}{old_ext}"),  # Original
-                delete_from_r2(f"{old_base}_display{old_ext}")  # Display
-            ]
-            await asyncio.gather(*delete_tasks, return_exceptions=True)
-        except Exception as e:
-            print(f"Warning: Failed to delete old logo {old_logo_url}: {e}")
+        # Delete both variants of old logo
+        old_base = old_logo_url.replace('.jpg', '').replace('.png', '').replace('.jpeg', '')
+        old_ext = '.jpg'  # Assume jpg since we always save as jpg
+
+        await delete_many_from_r2([
+            f"{old_base}{old_ext}",  # Original
+            f"{old_base}_display{old_ext}"  # Display
+        ])
 
     return base_path
+
+
+def _logo_upload_prefix(tenant_id: int) -> str:
+    return f"logos/tenant_{tenant_id}/logo_"
+
+
+async def create_logo_upload_url(tenant_id: int, content_type: str) -> dict:
+    """
+    Create a presigned PUT URL so the browser can upload a logo straight to R2.
+
+    The key deliberately carries the final .jpg name whatever the content
+    type: the confirm step re-encodes the upload to JPEG in place (and adds
+    the display variant) before the tenant is pointed at it, so the stored
+    logo ends up matching its name without an extra copy or rename.
+
+    Args:
+        tenant_id: Tenant ID for organizing uploads
+        content_type: MIME type the client will send (signed into the URL)
+
+    Returns:
+        dict: {"url": presigned PUT URL, "key": R2 object path}
+
+    Raises:
+        HTTPException: If the content type is not an allowed image type
+    """
+    if content_type not in ALLOWED_MIME_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file type. Allowed: {', '.join(ALLOWED_MIME_TYPES)}"
+        )
+
+    object_key = f"{_logo_upload_prefix(tenant_id)}{int(time.time())}.jpg"
+
+    async with get_r2_client() as client:
+        url = await client.generate_presigned_url(
+            'put_object',
+            Params={
+                'Bucket': settings.R2_BUCKET_NAME,
+                'Key': object_key,
+                'ContentType': content_type
+            },
+            ExpiresIn=LOGO_UPLOAD_URL_EXPIRES_SECONDS
+        )
+
+    return {"url": url, "key": object_key}
+
+
+async def verify_uploaded_logo(tenant_id: int, object_key: str) -> None:
+    """
+    Check that a directly-uploaded logo belongs to the tenant and exists in R2.
+
+    Raises:
+        HTTPException: If the key is foreign, missing or too large
+    """
+    if not object_key.startswith(_logo_upload_prefix(tenant_id)) or not object_key.endswith(".jpg"):
+        raise HTTPException(status_code=400, detail="Invalid logo key")
+
+    try:
+        async with get_r2_client() as client:
+            head = await client.head_object(Bucket=settings.R2_BUCKET_NAME, Key=object_key)
+    except ClientError:
+        raise HTTPException(status_code=400, detail="Logo has not been uploaded")
+
+    if head.get('ContentLength', 0) > MAX_FILE_SIZE:
+        await delete_many_from_r2([object_key])
+        raise HTTPException(
+            status_code=400,
+            detail=f"File too large. Maximum size: {MAX_FILE_SIZE / (1024*1024):.1f}MB"
+        )
+
+
+def _decode_logo_variants(content: bytes) -> dict:
+    """Decode an uploaded logo, check its dimensions and encode its variants"""
+    try:
+        image = Image.open(io.BytesIO(content))
+        image.load()
+    except Exception as e:
+        raise ValueError(f"Invalid image file: {str(e)}")
+
+    width, height = image.size
+    if width < 100 or height < 100:
+        raise ValueError(f"Image too small. Minimum 100x100px. Got {width}x{height}px")
+    if width > 2000 or height > 2000:
+        raise ValueError(f"Image too large. Maximum 2000x2000px. Got {width}x{height}px")
+
+    return create_logo_variants(image)
+
+
+async def finalize_uploaded_logo(object_key: str) -> None:
+    """
+    Re-encode a directly-uploaded logo as JPEG in place and create its
+    display variant. Runs before the tenant is pointed at the key, so an
+    upload that isn't a usable image never becomes the logo.
+
+    Args:
+        object_key: R2 path the client uploaded to (already verified)
+
+    Raises:
+        HTTPException: If the upload is not a decodable image of valid size
+                       (the object is deleted) or R2 access fails
+    """
+    try:
+        async with get_r2_client() as client:
+            response = await client.get_object(Bucket=settings.R2_BUCKET_NAME, Key=object_key)
+            async with response['Body'] as stream:
+                content = await stream.read()
+    except ClientError:
+        raise HTTPException(status_code=400, detail="Logo has not been uploaded")
+
+    # Pillow work is CPU-bound - keep it off the event loop
+    try:
+        variants = await asyncio.to_thread(_decode_logo_variants, content)
+    except ValueError as e:
+        await delete_many_from_r2([object_key])
+        raise HTTPException(status_code=400, detail=str(e))
+
+    upload_tasks = [upload_to_r2(variants['original'], object_key, 'image/jpeg')]
+    if 'display' in variants:
+        display_path = object_key.rsplit('.', 1)[0] + "_display.jpg"
+        upload_tasks.append(upload_to_r2(variants['display'], display_path, 'image/jpeg'))
+    await asyncio.gather(*upload_tasks)
@@ -1,7 +1,7 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Request, File, UploadFile, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exception_handlers import http_exception_handler
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, or_, desc, insert, update
@@ -41,14 +41,14 @@ from schemas import (
 )
 from subscription_middleware import check_branch_subscription_active
 from auth import (
-    get_password_hash, verify_password, create_access_token,
+    get_password_hash, get_password_hash_async, verify_password_async, create_access_token,
     get_current_active_user, get_current_tenant, get_current_branch_id,
     get_tenant_from_subdomain, ACCESS_TOKEN_EXPIRE_MINUTES,
     require_admin_role, get_current_user_role_in_tenant,
     # NEW: RBAC imports
     get_user_role_type, get_branch_scope, require_permission
 )
-from tenants import router as tenants_router
+from tenants import router as tenants_router, invalidate_usage_cache
 from platform_admin import router as platform_admin_router
 from subscription_api import router as subscription_router
 from fastapi.staticfiles import StaticFiles
@@ -56,7 +56,7 @@ from image_utils import process_and_upload_product_image, delete_from_r2
 from sku_utils import generate_unique_sku
 from timezone_utils import get_tenant_today, get_tenant_date_range, utc_to_tenant_date
 
-app = FastAPI(title="StatBricks API", version="2.0.0")
+app = FastAPI(title="StatBricks API", version="2.0.0", default_response_class=ORJSONResponse)
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -313,6 +313,15 @@ async def startup_event():
         logger.warning(f"⚠️ Could not validate Paystack configuration: {e}")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release shared outbound HTTP connections"""
+    from paystack_service import paystack_service
+    from email_service import email_service
+    await paystack_service.aclose()
+    await email_service.aclose()
+
+
 # ==================== AUTH ROUTES ====================
 
 @app.post("/auth/login")
@@ -334,7 +343,7 @@ async def login(
     )
     user = result.scalar_one_or_none()
 
-    if not user or not verify_password(login_data.password, user.hashed_password):
+    if not user or not await verify_password_async(login_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
@@ -703,7 +712,7 @@ async def forgot_password(
     Public endpoint (no authentication required).
     """
     import secrets
-    from email_service import EmailService
+    from email_service import email_service
     
     # Find user by email
     result = await db.execute(
@@ -730,7 +739,6 @@ async def forgot_password(
     await db.commit()
     
     # Send reset email (async, don't block)
-    email_service = EmailService()
     import asyncio
     asyncio.create_task(
         email_service.send_password_reset_email(
@@ -792,7 +800,7 @@ async def reset_password(
         )
     
     # Update password
-    user.hashed_password = get_password_hash(request.new_password)
+    user.hashed_password = await get_password_hash_async(request.new_password)
     
     # Clear reset token
     user.reset_token = None
@@ -1430,6 +1438,7 @@ async def create_product(
         db.add(branch_stock)
 
     await db.commit()
+    invalidate_usage_cache(new_product.tenant_id)
     await db.refresh(new_product)
 
     # Eagerly load category_rel for response serialization
@@ -2624,8 +2633,7 @@ async def send_email_receipt(
         raise HTTPException(status_code=400, detail="No customer email on file for this sale")
     
     # Send email
-    from email_service import EmailService
-    email_service = EmailService()
+    from email_service import email_service
     
     try:
         await email_service.send_receipt_email(
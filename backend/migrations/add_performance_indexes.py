@@ -0,0 +1,97 @@
+"""
+Migration: Add performance indexes
+
+create_all only creates indexes together with brand-new tables, so indexes
+added to existing models are created here. Each statement uses
+IF NOT EXISTS, making this safe to run multiple times (idempotent).
+"""
+
+import logging
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+
+# (index name, CREATE INDEX statement) - keep in sync with __table_args__ in models.py
+PERFORMANCE_INDEXES = [
+    (
+        "idx_active_branch_parent_live",
+        """
+        CREATE INDEX IF NOT EXISTS idx_active_branch_parent_live
+        ON active_branch_subscriptions (parent_tenant_id)
+        INCLUDE (branch_tenant_id, subscription_end_date)
+        WHERE is_active AND NOT is_cancelled
+        """
+    ),
+    (
+        "idx_active_branch_lookup",
+        """
+        CREATE INDEX IF NOT EXISTS idx_active_branch_lookup
+        ON active_branch_subscriptions (parent_tenant_id, branch_tenant_id, subscription_end_date)
+        INCLUDE (id)
+        WHERE is_active
+        """
+    ),
+    (
+        "idx_tenants_billing_active",
+        """
+        CREATE INDEX IF NOT EXISTS idx_tenants_billing_active
+        ON tenants (next_billing_date)
+        WHERE subscription_status = 'active' AND owner_email IS NOT NULL
+        """
+    ),
+    (
+        "idx_sales_tenant_created",
+        """
+        CREATE INDEX IF NOT EXISTS idx_sales_tenant_created
+        ON sales (tenant_id, created_at)
+        """
+    ),
+    (
+        "idx_sales_tenant_user",
+        """
+        CREATE INDEX IF NOT EXISTS idx_sales_tenant_user
+        ON sales (tenant_id, user_id)
+        """
+    ),
+    (
+        "idx_stock_movements_user",
+        """
+        CREATE INDEX IF NOT EXISTS idx_stock_movements_user
+        ON stock_movements (user_id)
+        """
+    ),
+    (
+        "idx_tenant_users_user_active",
+        """
+        CREATE INDEX IF NOT EXISTS idx_tenant_users_user_active
+        ON tenant_users (user_id, is_active)
+        """
+    ),
+    (
+        "idx_tenants_parent_created",
+        """
+        CREATE INDEX IF NOT EXISTS idx_tenants_parent_created
+        ON tenants (parent_tenant_id, created_at)
+        """
+    ),
+]
+
+
+async def run_migration(engine: AsyncEngine):
+    """Create any missing performance indexes (PostgreSQL only)."""
+    if engine.dialect.name == "sqlite":
+        # Fresh SQLite databases get their indexes from create_all
+        return
+
+    logger.info("🔍 Checking performance indexes...")
+
+    for index_name, create_sql in PERFORMANCE_INDEXES:
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(create_sql))
+        except Exception as e:
+            logger.warning(f"⚠️  Could not create index {index_name}: {e}")
+
+    logger.info("✅ Performance indexes in place")
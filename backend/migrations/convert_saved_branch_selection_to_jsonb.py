@@ -0,0 +1,43 @@
+"""
+Migration: Convert tenants.saved_branch_selection_json to JSONB
+
+The auto-renewal branch selection used to be stored as a TEXT-encoded JSON array
+and was parsed/re-serialized on every cancel/reactivate. Storing it as native
+JSONB lets SQLAlchemy hand back a Python list directly.
+
+This migration is safe to run multiple times (idempotent).
+"""
+
+import logging
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+
+async def run_migration(engine: AsyncEngine):
+    """Alter saved_branch_selection_json from TEXT to JSONB (PostgreSQL only)."""
+    if engine.dialect.name == "sqlite":
+        # SQLite stores the JSON type as TEXT already - nothing to convert
+        return
+
+    async with engine.connect() as conn:
+        result = await conn.execute(text("""
+            SELECT data_type
+            FROM information_schema.columns
+            WHERE table_name = 'tenants' AND column_name = 'saved_branch_selection_json'
+        """))
+        data_type = result.scalar()
+
+    if data_type is None or data_type == "jsonb":
+        logger.info("✅ saved_branch_selection_json already JSONB")
+        return
+
+    logger.info(f"🔄 Converting tenants.saved_branch_selection_json from {data_type} to JSONB...")
+    async with engine.begin() as conn:
+        await conn.execute(text("""
+            ALTER TABLE tenants
+            ALTER COLUMN saved_branch_selection_json TYPE JSONB
+            USING NULLIF(saved_branch_selection_json, '')::jsonb
+        """))
+    logger.info("✅ Converted saved_branch_selection_json to JSONB")
@@ -268,6 +268,14 @@ async def run_migrations():
     from migrations.make_categories_units_global import run_migration as make_categories_units_global
     await make_categories_units_global(engine)
 
+    # Store auto-renewal branch selection as native JSONB
+    from migrations.convert_saved_branch_selection_to_jsonb import run_migration as convert_saved_branch_selection
+    await convert_saved_branch_selection(engine)
+
+    # Indexes added to existing tables (create_all only indexes new tables)
+    from migrations.add_performance_indexes import run_migration as add_performance_indexes
+    await add_performance_indexes(engine)
+
     logger.info("=" * 60)
     logger.info("Database schema migration completed!")
     logger.info("=" * 60)
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Text, Enum as SQLEnum, Table, UniqueConstraint, Index, Date
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Text, Enum as SQLEnum, Table, UniqueConstraint, Index, Date, JSON, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.mutable import MutableList
 from sqlalchemy.orm import relationship, backref
 from datetime import datetime
 import enum
@@ -63,6 +65,7 @@ tenant_users = Table(
     UniqueConstraint('tenant_id', 'user_id', name='uq_tenant_user'),
     Index('idx_tenant_users_tenant', 'tenant_id'),
     Index('idx_tenant_users_user', 'user_id'),
+    Index('idx_tenant_users_user_active', 'user_id', 'is_active'),  # A user's active memberships
     Index('idx_tenant_users_branch', 'branch_id'),
     Index('idx_tenant_users_last_login', 'last_login_at')
 )
@@ -134,7 +137,7 @@ class Tenant(Base):
     paystack_subscription_code = Column(String(100), nullable=True)  # Paystack subscription ID
     paystack_plan_code = Column(String(100), nullable=True)  # Which plan they're on
     auto_renewal_enabled = Column(Boolean, default=False)  # Whether auto-renewal is enabled
-    saved_branch_selection_json = Column(Text, nullable=True)  # JSON array of branch IDs to auto-renew
+    saved_branch_selection_json = Column(MutableList.as_mutable(JSON().with_variant(JSONB(), 'postgresql')), nullable=True)  # JSON array of branch IDs to auto-renew
 
     # Payment Tracking
     last_payment_date = Column(DateTime, nullable=True)
@@ -175,6 +178,17 @@ class Tenant(Base):
     sales = relationship("Sale", foreign_keys="Sale.tenant_id", back_populates="tenant", cascade="all, delete-orphan")  # Specify foreign key to avoid ambiguity with branch_id
     branch_stocks = relationship("BranchStock", back_populates="branch", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Scheduler lookup of paying tenants by billing date
+        Index(
+            'idx_tenants_billing_active',
+            'next_billing_date',
+            postgresql_where=text("subscription_status = 'active' AND owner_email IS NOT NULL")
+        ),
+        # Branch listing: WHERE parent_tenant_id = ? ORDER BY created_at
+        Index('idx_tenants_parent_created', 'parent_tenant_id', 'created_at'),
+    )
+
     def __repr__(self):
         return f"<Tenant {self.name} ({self.subdomain})>"
 
@@ -387,6 +401,7 @@ class Sale(Base):
         Index('idx_sales_tenant_status', 'tenant_id', 'status'),
         Index('idx_sales_tenant_created', 'tenant_id', 'created_at'),
         Index('idx_sales_tenant_branch', 'tenant_id', 'branch_id'),  # NEW: Index for branch-filtered queries
+        Index('idx_sales_tenant_user', 'tenant_id', 'user_id'),  # Per-user sale counts within a tenant
     )
 
     def __repr__(self):
@@ -443,6 +458,7 @@ class StockMovement(Base):
 
     __table_args__ = (
         Index('idx_stock_movements_product', 'product_id'),
+        Index('idx_stock_movements_user', 'user_id'),
     )
 
     def __repr__(self):
@@ -723,6 +739,20 @@ class ActiveBranchSubscription(Base):
         Index('idx_active_branch_parent', 'parent_tenant_id'),
         Index('idx_active_branch_end_date', 'subscription_end_date'),
         Index('idx_active_branch_cancelled', 'is_cancelled'),
+        # Partial covering index for "live subscriptions of this organization" lookups
+        Index(
+            'idx_active_branch_parent_live',
+            'parent_tenant_id',
+            postgresql_include=['branch_tenant_id', 'subscription_end_date'],
+            postgresql_where=text('is_active AND NOT is_cancelled')
+        ),
+        # Covering index for the per-request "is this branch paid?" check
+        Index(
+            'idx_active_branch_lookup',
+            'parent_tenant_id', 'branch_tenant_id', 'subscription_end_date',
+            postgresql_include=['id'],
+            postgresql_where=text('is_active')
+        ),
     )
 
     def __repr__(self):
@@ -7,8 +7,9 @@ import httpx
 import hmac
 import hashlib
 import logging
+import time
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from config import settings
 
 logger = logging.getLogger(__name__)
@@ -57,6 +58,10 @@ SUBSCRIPTION_PLANS = {
 }
 
 
+# How long a credential verification result is reused before calling Paystack again
+CREDENTIALS_CACHE_TTL_SECONDS = 300
+
+
 class PaystackService:
     """Service for Paystack payment operations"""
 
@@ -68,6 +73,28 @@ class PaystackService:
             "Authorization": f"Bearer {self.secret_key}",
             "Content-Type": "application/json"
         }
+        self._client: Optional[httpx.AsyncClient] = None
+        # (secret_key, expires_at, result) of the last definitive credential check
+        self._credentials_cache: Optional[Tuple[str, float, Dict[str, Any]]] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Shared HTTP/2 client so Paystack calls reuse keep-alive connections
+        instead of paying a TCP + TLS handshake per request.
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=30.0,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=50)
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP client (called on app shutdown)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     def is_configured(self) -> bool:
         """Check if Paystack keys are configured"""
@@ -139,6 +166,9 @@ class PaystackService:
         """
         Test API connection with current credentials.
         Makes a simple API call to verify the secret key is valid.
+
+        Valid/invalid results are cached for CREDENTIALS_CACHE_TTL_SECONDS per
+        secret key; transient errors are never cached.
         """
         if not self.is_configured():
             return {
@@ -146,31 +176,39 @@ class PaystackService:
                 "message": "Paystack keys are not configured"
             }
 
+        cached = self._credentials_cache
+        if cached and cached[0] == self.secret_key and cached[1] > time.monotonic():
+            return dict(cached[2])
+
         try:
-            async with httpx.AsyncClient() as client:
-                # Use the balance endpoint as a simple API test
-                response = await client.get(
-                    f"{self.base_url}/balance",
-                    headers=self.headers,
-                    timeout=10.0
-                )
-
-                if response.status_code == 200:
-                    return {
-                        "status": True,
-                        "message": "Paystack credentials are valid"
-                    }
-                elif response.status_code == 401:
-                    return {
-                        "status": False,
-                        "message": "Invalid API key - authentication failed"
-                    }
-                else:
-                    data = response.json()
-                    return {
-                        "status": False,
-                        "message": data.get("message", f"API error: {response.status_code}")
-                    }
+            client = self._get_client()
+            # Use the balance endpoint as a simple API test
+            response = await client.get(
+                f"{self.base_url}/balance",
+                headers=self.headers,
+                timeout=10.0
+            )
+
+            if response.status_code == 200:
+                result = {
+                    "status": True,
+                    "message": "Paystack credentials are valid"
+                }
+                self._credentials_cache = (self.secret_key, time.monotonic() + CREDENTIALS_CACHE_TTL_SECONDS, result)
+                return dict(result)
+            elif response.status_code == 401:
+                result = {
+                    "status": False,
+                    "message": "Invalid API key - authentication failed"
+                }
+                self._credentials_cache = (self.secret_key, time.monotonic() + CREDENTIALS_CACHE_TTL_SECONDS, result)
+                return dict(result)
+            else:
+                data = response.json()
+                return {
+                    "status": False,
+                    "message": data.get("message", f"API error: {response.status_code}")
+                }
 
         except httpx.TimeoutException:
             return {
@@ -246,28 +284,28 @@ class PaystackService:
                 }
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/transaction/initialize",
-                    json=payload,
-                    headers=self.headers,
-                    timeout=30.0
-                )
+            client = self._get_client()
+            response = await client.post(
+                f"{self.base_url}/transaction/initialize",
+                json=payload,
+                headers=self.headers,
+                timeout=30.0
+            )
                 
-                response.raise_for_status()
-                data = response.json()
+            response.raise_for_status()
+            data = response.json()
                 
-                if data.get('status'):
-                    logger.info(f"✅ Payment initialized for tenant {tenant_id}: {reference}")
-                    return {
-                        "status": True,
-                        "authorization_url": data['data']['authorization_url'],
-                        "access_code": data['data']['access_code'],
-                        "reference": data['data']['reference']
-                    }
-                else:
-                    logger.error(f"❌ Payment initialization failed: {data.get('message')}")
-                    return {"status": False, "message": data.get('message')}
+            if data.get('status'):
+                logger.info(f"✅ Payment initialized for tenant {tenant_id}: {reference}")
+                return {
+                    "status": True,
+                    "authorization_url": data['data']['authorization_url'],
+                    "access_code": data['data']['access_code'],
+                    "reference": data['data']['reference']
+                }
+            else:
+                logger.error(f"❌ Payment initialization failed: {data.get('message')}")
+                return {"status": False, "message": data.get('message')}
         
         except httpx.HTTPStatusError as e:
             logger.error(f"❌ Paystack API error: {e.response.text}")
@@ -303,36 +341,36 @@ class PaystackService:
             Dictionary with transaction details
         """
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/transaction/verify/{reference}",
-                    headers=self.headers,
-                    timeout=30.0
-                )
+            client = self._get_client()
+            response = await client.get(
+                f"{self.base_url}/transaction/verify/{reference}",
+                headers=self.headers,
+                timeout=30.0
+            )
                 
-                response.raise_for_status()
-                data = response.json()
+            response.raise_for_status()
+            data = response.json()
                 
-                if data.get('status'):
-                    transaction_data = data['data']
-                    logger.info(f"✅ Transaction verified: {reference} - Status: {transaction_data.get('status')}")
-                    
-                    return {
-                        "status": True,
-                        "data": {
-                            "reference": transaction_data.get('reference'),
-                            "amount": transaction_data.get('amount'),
-                            "currency": transaction_data.get('currency'),
-                            "status": transaction_data.get('status'),
-                            "paid_at": transaction_data.get('paid_at'),
-                            "customer": transaction_data.get('customer'),
-                            "metadata": transaction_data.get('metadata'),
-                            "channel": transaction_data.get('channel'),
-                            "authorization": transaction_data.get('authorization')
-                        }
+            if data.get('status'):
+                transaction_data = data['data']
+                logger.info(f"✅ Transaction verified: {reference} - Status: {transaction_data.get('status')}")
+                
+                return {
+                    "status": True,
+                    "data": {
+                        "reference": transaction_data.get('reference'),
+                        "amount": transaction_data.get('amount'),
+                        "currency": transaction_data.get('currency'),
+                        "status": transaction_data.get('status'),
+                        "paid_at": transaction_data.get('paid_at'),
+                        "customer": transaction_data.get('customer'),
+                        "metadata": transaction_data.get('metadata'),
+                        "channel": transaction_data.get('channel'),
+                        "authorization": transaction_data.get('authorization')
                     }
-                else:
-                    return {"status": False, "message": data.get('message')}
+                }
+            else:
+                return {"status": False, "message": data.get('message')}
         
         except httpx.HTTPStatusError as e:
             logger.error(f"❌ Verification error: {e.response.text}")
@@ -508,6 +546,50 @@ class PaystackService:
             "plan_name": plan['name']
         }
 
+    def price_from_counts(
+        self,
+        billing_cycle: str,
+        num_locations: int,
+        main_included: bool
+    ) -> Dict[str, Any]:
+        """
+        Calculate total subscription cost from location counts only.
+
+        Same pricing as calculate_total_for_selected_branches, for callers that
+        only need totals and can count the selected locations in SQL.
+
+        Args:
+            billing_cycle: 'monthly', 'semi_annual', or 'annual'
+            num_locations: Number of selected locations, main location included
+            main_included: Whether the main location is among the selection
+
+        Returns:
+            Dictionary with pricing totals
+        """
+        plan = SUBSCRIPTION_PLANS.get(billing_cycle)
+        if not plan:
+            raise ValueError(f"Invalid billing cycle: {billing_cycle}")
+
+        if not main_included:
+            raise ValueError("Main location must be included in subscription")
+
+        base_price = plan['amount']  # Main location price in kobo
+        branch_price = int(base_price * 0.8)  # Branch price (80% of main)
+
+        num_branches = num_locations - 1
+        branches_total_kobo = num_branches * branch_price
+        total_amount_kobo = base_price + branches_total_kobo
+
+        return {
+            "num_branches": num_branches,
+            "branches_total_kobo": branches_total_kobo,
+            "branches_total_kes": branches_total_kobo / 100,
+            "total_amount_kobo": total_amount_kobo,
+            "total_amount_kes": total_amount_kobo / 100,
+            "billing_cycle": billing_cycle,
+            "plan_name": plan['name']
+        }
+
     def calculate_prorata_price(
         self,
         billing_cycle: str,
@@ -574,31 +656,31 @@ class PaystackService:
             Dictionary with plan details from Paystack
         """
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                payload = {
-                    "name": name,
-                    "amount": amount,
-                    "interval": interval,
-                    "plan_code": plan_code,
-                    "currency": "KES",
-                    "description": f"{name} subscription plan",
-                    "send_invoices": True,
-                    "send_sms": False
-                }
+            client = self._get_client()
+            payload = {
+                "name": name,
+                "amount": amount,
+                "interval": interval,
+                "plan_code": plan_code,
+                "currency": "KES",
+                "description": f"{name} subscription plan",
+                "send_invoices": True,
+                "send_sms": False
+            }
 
-                response = await client.post(
-                    f"{self.base_url}/plan",
-                    json=payload,
-                    headers=self.headers
-                )
-                result = response.json()
+            response = await client.post(
+                f"{self.base_url}/plan",
+                json=payload,
+                headers=self.headers
+            )
+            result = response.json()
 
-                if result.get('status'):
-                    logger.info(f"✅ Subscription plan created: {plan_code}")
-                    return {"status": True, "data": result.get('data'), "message": result.get('message')}
-                else:
-                    logger.error(f"❌ Failed to create plan: {result.get('message')}")
-                    return {"status": False, "message": result.get('message')}
+            if result.get('status'):
+                logger.info(f"✅ Subscription plan created: {plan_code}")
+                return {"status": True, "data": result.get('data'), "message": result.get('message')}
+            else:
+                logger.error(f"❌ Failed to create plan: {result.get('message')}")
+                return {"status": False, "message": result.get('message')}
 
         except Exception as e:
             logger.error(f"❌ Error creating subscription plan: {str(e)}")
@@ -622,35 +704,35 @@ class PaystackService:
             Dictionary with subscription details including subscription_code
         """
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                payload = {
-                    "customer": customer_email,
-                    "plan": plan_code
-                }
+            client = self._get_client()
+            payload = {
+                "customer": customer_email,
+                "plan": plan_code
+            }
 
-                if authorization_code:
-                    payload["authorization"] = authorization_code
+            if authorization_code:
+                payload["authorization"] = authorization_code
 
-                response = await client.post(
-                    f"{self.base_url}/subscription",
-                    json=payload,
-                    headers=self.headers
-                )
-                result = response.json()
+            response = await client.post(
+                f"{self.base_url}/subscription",
+                json=payload,
+                headers=self.headers
+            )
+            result = response.json()
 
-                if result.get('status'):
-                    subscription_data = result.get('data', {})
-                    logger.info(f"✅ Subscription created: {subscription_data.get('subscription_code')}")
-                    return {
-                        "status": True,
-                        "data": subscription_data,
-                        "subscription_code": subscription_data.get('subscription_code'),
-                        "email_token": subscription_data.get('email_token'),
-                        "next_payment_date": subscription_data.get('next_payment_date')
-                    }
-                else:
-                    logger.error(f"❌ Failed to create subscription: {result.get('message')}")
-                    return {"status": False, "message": result.get('message')}
+            if result.get('status'):
+                subscription_data = result.get('data', {})
+                logger.info(f"✅ Subscription created: {subscription_data.get('subscription_code')}")
+                return {
+                    "status": True,
+                    "data": subscription_data,
+                    "subscription_code": subscription_data.get('subscription_code'),
+                    "email_token": subscription_data.get('email_token'),
+                    "next_payment_date": subscription_data.get('next_payment_date')
+                }
+            else:
+                logger.error(f"❌ Failed to create subscription: {result.get('message')}")
+                return {"status": False, "message": result.get('message')}
 
         except Exception as e:
             logger.error(f"❌ Error creating subscription: {str(e)}")
@@ -668,25 +750,25 @@ class PaystackService:
             Dictionary with status and message
         """
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                payload = {
-                    "code": subscription_code,
-                    "token": email_token
-                }
+            client = self._get_client()
+            payload = {
+                "code": subscription_code,
+                "token": email_token
+            }
 
-                response = await client.post(
-                    f"{self.base_url}/subscription/disable",
-                    json=payload,
-                    headers=self.headers
-                )
-                result = response.json()
+            response = await client.post(
+                f"{self.base_url}/subscription/disable",
+                json=payload,
+                headers=self.headers
+            )
+            result = response.json()
 
-                if result.get('status'):
-                    logger.info(f"✅ Subscription disabled: {subscription_code}")
-                    return {"status": True, "message": "Subscription disabled successfully"}
-                else:
-                    logger.error(f"❌ Failed to disable subscription: {result.get('message')}")
-                    return {"status": False, "message": result.get('message')}
+            if result.get('status'):
+                logger.info(f"✅ Subscription disabled: {subscription_code}")
+                return {"status": True, "message": "Subscription disabled successfully"}
+            else:
+                logger.error(f"❌ Failed to disable subscription: {result.get('message')}")
+                return {"status": False, "message": result.get('message')}
 
         except Exception as e:
             logger.error(f"❌ Error disabling subscription: {str(e)}")
@@ -704,25 +786,25 @@ class PaystackService:
             Dictionary with status and message
         """
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                payload = {
-                    "code": subscription_code,
-                    "token": email_token
-                }
+            client = self._get_client()
+            payload = {
+                "code": subscription_code,
+                "token": email_token
+            }
 
-                response = await client.post(
-                    f"{self.base_url}/subscription/enable",
-                    json=payload,
-                    headers=self.headers
-                )
-                result = response.json()
+            response = await client.post(
+                f"{self.base_url}/subscription/enable",
+                json=payload,
+                headers=self.headers
+            )
+            result = response.json()
 
-                if result.get('status'):
-                    logger.info(f"✅ Subscription enabled: {subscription_code}")
-                    return {"status": True, "message": "Subscription enabled successfully"}
-                else:
-                    logger.error(f"❌ Failed to enable subscription: {result.get('message')}")
-                    return {"status": False, "message": result.get('message')}
+            if result.get('status'):
+                logger.info(f"✅ Subscription enabled: {subscription_code}")
+                return {"status": True, "message": "Subscription enabled successfully"}
+            else:
+                logger.error(f"❌ Failed to enable subscription: {result.get('message')}")
+                return {"status": False, "message": result.get('message')}
 
         except Exception as e:
             logger.error(f"❌ Error enabling subscription: {str(e)}")
@@ -739,18 +821,18 @@ class PaystackService:
             Dictionary with subscription details
         """
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    f"{self.base_url}/subscription/{id_or_code}",
-                    headers=self.headers
-                )
-                result = response.json()
-
-                if result.get('status'):
-                    return {"status": True, "data": result.get('data')}
-                else:
-                    logger.error(f"❌ Failed to fetch subscription: {result.get('message')}")
-                    return {"status": False, "message": result.get('message')}
+            client = self._get_client()
+            response = await client.get(
+                f"{self.base_url}/subscription/{id_or_code}",
+                headers=self.headers
+            )
+            result = response.json()
+
+            if result.get('status'):
+                return {"status": True, "data": result.get('data')}
+            else:
+                logger.error(f"❌ Failed to fetch subscription: {result.get('message')}")
+                return {"status": False, "message": result.get('message')}
 
         except Exception as e:
             logger.error(f"❌ Error fetching subscription: {str(e)}")
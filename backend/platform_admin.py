@@ -18,13 +18,14 @@ from pydantic import BaseModel, EmailStr
 from database import get_db
 from models import User, Tenant, Sale, Product, tenant_users, SubscriptionPlan, AdminActivityLog, ActiveBranchSubscription, Category, Unit
 from auth import (
-    get_password_hash,
-    verify_password,
+    get_password_hash_async,
+    verify_password_async,
     create_super_admin_token,
     require_super_admin,
     ACCESS_TOKEN_EXPIRE_MINUTES,
     get_current_super_admin
 )
+from subscription_middleware import invalidate_subscription_cache
 import json
 
 router = APIRouter(prefix="/api/platform", tags=["Platform Admin"])
@@ -189,7 +190,7 @@ async def register_super_admin(
     new_user = User(
         username=data.username,
         email=data.email,
-        hashed_password=get_password_hash(data.password),
+        hashed_password=await get_password_hash_async(data.password),
         full_name=data.full_name,
         is_super_admin=True,
         is_active=True
@@ -223,7 +224,7 @@ async def login_super_admin(
     )
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(data.password, user.hashed_password):
+    if not user or not await verify_password_async(data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
@@ -861,6 +862,7 @@ async def update_tenant_subscription(
     tenant.updated_at = datetime.utcnow()
     
     await db.commit()
+    invalidate_subscription_cache(tenant.id)
     await db.refresh(tenant)
     
     # Log activity
@@ -941,6 +943,7 @@ async def revoke_tenant_subscription(
     tenant.updated_at = datetime.utcnow()
 
     await db.commit()
+    invalidate_subscription_cache(tenant.id)
 
     # Log activity
     await log_admin_activity(
@@ -1003,6 +1006,7 @@ async def block_tenant(
     tenant.updated_at = datetime.utcnow()
 
     await db.commit()
+    invalidate_subscription_cache(tenant.id)
 
     # Log activity
     await log_admin_activity(
@@ -1064,6 +1068,7 @@ async def unblock_tenant(
     tenant.updated_at = datetime.utcnow()
 
     await db.commit()
+    invalidate_subscription_cache(tenant.id)
 
     # Log activity
     await log_admin_activity(
@@ -1352,7 +1357,7 @@ async def create_super_admin(
     new_admin = User(
         username=data.username,
         email=data.email,
-        hashed_password=get_password_hash(data.password),
+        hashed_password=await get_password_hash_async(data.password),
         full_name=data.full_name,
         is_super_admin=True,
         env_based=False,  # UI-created admins are NOT env-based
@@ -1533,7 +1538,7 @@ async def reset_admin_password(
         )
     
     # Update password
-    admin.hashed_password = get_password_hash(data.new_password)
+    admin.hashed_password = await get_password_hash_async(data.new_password)
     await db.commit()
     
     # Log activity
@@ -90,6 +90,27 @@ class TenantSummary(BaseModel):
         from_attributes = True
 
 
+class SubdomainAvailabilityRequest(BaseModel):
+    """Several candidate subdomains to check in one request"""
+    subdomains: List[str] = Field(..., min_length=1, max_length=50)
+
+
+class LogoUploadRequest(BaseModel):
+    """Request a presigned URL for a direct-to-R2 logo upload"""
+    content_type: str
+
+
+class LogoUploadURL(BaseModel):
+    """Presigned PUT URL and the R2 key it writes to"""
+    url: str
+    key: str
+
+
+class LogoUploadConfirm(BaseModel):
+    """Confirm a logo the client has uploaded directly to R2"""
+    key: str
+
+
 # User-Tenant Association Schemas
 class UserTenantInfo(BaseModel):
     """User's role within a specific tenant"""
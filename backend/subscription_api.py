@@ -3,18 +3,22 @@ Subscription API Endpoints
 Handles payment initialization, verification, and subscription management
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Request, Header, Body
+from fastapi import APIRouter, Depends, HTTPException, Request, Header, Body, Response
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, case, update, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
 from datetime import datetime, timedelta
-from typing import Optional
+from types import MappingProxyType
+from typing import Dict, Optional, Tuple
 from pydantic import BaseModel
 import logging
 
-from database import get_db
-from models import Tenant, User, SubscriptionTransaction, BranchSubscription, ActiveBranchSubscription, Expense
+from database import get_db, engine
+from models import Tenant, User, SubscriptionTransaction, BranchSubscription, ActiveBranchSubscription, Expense, tenant_users, UserRole
 from auth import get_current_user
 from paystack_service import paystack_service, SUBSCRIPTION_PLANS
+from subscription_middleware import invalidate_subscription_cache
 from config import settings
 from schemas import (
     SubscriptionInitializeRequest,
@@ -30,10 +34,112 @@ from schemas import (
     AddBranchRequest,
     AddBranchResponse
 )
+import asyncio
 import json
+import orjson
 
 logger = logging.getLogger(__name__)
-router = APIRouter(prefix="/api/subscription", tags=["subscription"])
+# ORJSONResponse only speeds up the final encode: FastAPI still runs
+# response_model validation / jsonable_encoder first (datetimes are ISO
+# strings by the time orjson sees them), so keep the response models
+router = APIRouter(prefix="/api/subscription", tags=["subscription"], default_response_class=ORJSONResponse)
+
+
+# Savings map based on KES 2,000/month base price
+# Monthly: KES 2,000 x 1 = KES 2,000 (0 savings)
+# Quarterly: KES 2,000 x 3 = KES 6,000 - KES 5,400 = KES 600 savings
+# Semi-annual: KES 2,000 x 6 = KES 12,000 - KES 9,720 = KES 2,280 savings
+# Annual: KES 2,000 x 12 = KES 24,000 - KES 18,360 = KES 5,640 savings
+_SAVINGS_MAP = MappingProxyType({
+    'monthly': 0,
+    'quarterly': 600,
+    'semi_annual': 2280,
+    'annual': 5640
+})
+
+# Billing cycles ordered by length - upgrades must move to a higher value
+_CYCLE_ORDER = MappingProxyType({'monthly': 1, 'quarterly': 2, 'semi_annual': 3, 'annual': 4})
+
+# Response body for GET /plans - plans, savings and trial length never change at runtime
+_PLANS_RESPONSE = {
+    "plans": [
+        {
+            "id": key,
+            "name": plan['name'],
+            "amount": plan['amount'] / 100,  # Convert to KES (total price)
+            "amount_kobo": plan['amount'],
+            "monthly_equivalent": plan.get('monthly_equivalent', plan['amount'] / 100),
+            "interval": plan['interval'],
+            "duration_days": plan['duration_days'],
+            "description": plan['description'],
+            "savings": _SAVINGS_MAP.get(key, 0)
+        }
+        for key, plan in SUBSCRIPTION_PLANS.items()
+    ],
+    "currency": "KES",
+    "trial_period_days": settings.TRIAL_PERIOD_DAYS
+}
+_PLANS_RESPONSE_JSON = orjson.dumps(_PLANS_RESPONSE)
+
+
+def _id_in(column, ids: list):
+    """
+    Membership filter for a list of integer ids.
+
+    On PostgreSQL this binds the whole list as one array parameter
+    (column = ANY(:ids)), so the statement text - and asyncpg's prepared
+    statement cache entry - is the same however many ids are passed.
+    Other dialects (SQLite desktop mode) fall back to IN.
+    """
+    if engine.dialect.name == "postgresql":
+        return column == any_(bindparam(None, list(ids), type_=ARRAY(Integer)))
+    return column.in_(ids)
+
+
+def _get_user_tenants(current_user: User) -> Tuple[Tenant, Tenant]:
+    """
+    Return (user's tenant, parent tenant) for the current user.
+
+    Both are eager-loaded by get_current_user, so no query is issued. For a
+    main location the parent tenant is the tenant itself.
+    """
+    if not current_user.tenants:
+        raise HTTPException(status_code=404, detail="User has no associated tenant")
+
+    tenant = current_user.tenants[0]
+    return tenant, tenant.parent_tenant or tenant
+
+
+async def _price_selected_branches(
+    db: AsyncSession,
+    billing_cycle: str,
+    selected_branch_ids: list,
+    parent_tenant_id: int
+) -> dict:
+    """
+    Price the selected locations using a single aggregate query.
+
+    Only the number of existing locations and whether the main location is among
+    them affect the total, so no Tenant rows are loaded.
+    """
+    # Single-location organizations (the common case) need no query at all -
+    # the parent tenant is already loaded
+    if list(selected_branch_ids) == [parent_tenant_id]:
+        return paystack_service.price_from_counts(billing_cycle, num_locations=1, main_included=True)
+
+    result = await db.execute(
+        select(
+            func.count(Tenant.id).label("num_locations"),
+            func.coalesce(func.sum(case((Tenant.id == parent_tenant_id, 1), else_=0)), 0).label("main_count")
+        ).where(_id_in(Tenant.id, selected_branch_ids))
+    )
+    row = result.one()
+
+    return paystack_service.price_from_counts(
+        billing_cycle,
+        num_locations=row.num_locations,
+        main_included=row.main_count > 0
+    )
 
 
 @router.post("/initialize")
@@ -44,27 +150,22 @@ async def initialize_payment(
 ):
     """Initialize Paystack payment for subscription with per-branch selection"""
 
-    # Get user's tenant (parent tenant)
-    result = await db.execute(
-        select(Tenant).where(Tenant.id == current_user.tenants[0].id)
-    )
-    tenant = result.scalar_one_or_none()
-
-    if not tenant:
-        raise HTTPException(status_code=404, detail="Tenant not found")
+    now = datetime.utcnow()
 
-    # Determine parent tenant ID
-    parent_tenant_id = tenant.parent_tenant_id if tenant.parent_tenant_id else tenant.id
+    # Get user's tenant and its parent (eager-loaded with the user, no query needed)
+    tenant, parent_tenant = _get_user_tenants(current_user)
+    parent_tenant_id = parent_tenant.id
 
     # Validate selected_branch_ids - all must belong to organization
     selected_ids = request.selected_branch_ids
+    # Only id and name are needed, so skip hydrating full Tenant rows
     branch_results = await db.execute(
-        select(Tenant).where(
-            Tenant.id.in_(selected_ids),
+        select(Tenant.id, Tenant.name).where(
+            _id_in(Tenant.id, selected_ids),
             ((Tenant.id == parent_tenant_id) | (Tenant.parent_tenant_id == parent_tenant_id))
         )
     )
-    selected_branches = branch_results.scalars().all()
+    selected_branches = branch_results.all()
 
     if len(selected_branches) != len(selected_ids):
         raise HTTPException(status_code=400, detail="Invalid branch selection")
@@ -110,8 +211,8 @@ async def initialize_payment(
             billing_cycle=request.billing_cycle,
             paystack_reference=payment_result['reference'],
             paystack_status='pending',
-            subscription_start_date=datetime.utcnow(),
-            subscription_end_date=datetime.utcnow() + timedelta(days=plan['duration_days']),
+            subscription_start_date=now,
+            subscription_end_date=now + timedelta(days=plan['duration_days']),
             num_branches_included=len(selected_ids),
             branch_selection_json=json.dumps(selected_ids),
             main_location_included=True
@@ -139,6 +240,8 @@ async def verify_payment(
 ):
     """Verify payment and activate subscription with per-branch records (idempotent)"""
 
+    now = datetime.utcnow()
+
     # Get transaction record first
     db_result = await db.execute(
         select(SubscriptionTransaction).where(
@@ -173,7 +276,7 @@ async def verify_payment(
 
     # Update transaction
     transaction.paystack_status = 'success'
-    transaction.payment_date = datetime.utcnow()
+    transaction.payment_date = now
     transaction.paystack_customer_code = transaction_data['customer'].get('customer_code')
     transaction.channel = transaction_data.get('channel')
 
@@ -182,10 +285,7 @@ async def verify_payment(
 
     # Update parent tenant subscription
     parent_tenant_id = transaction.tenant_id
-    tenant_result = await db.execute(
-        select(Tenant).where(Tenant.id == parent_tenant_id)
-    )
-    tenant = tenant_result.scalar_one()
+    tenant = await db.get(Tenant, parent_tenant_id)
 
     tenant.subscription_status = 'active'
     tenant.subscription_plan = 'PREMIUM'
@@ -201,10 +301,7 @@ async def verify_payment(
     # Create branch subscription records
     for branch_id in selected_branch_ids:
         # Check if branch exists
-        branch_result = await db.execute(
-            select(Tenant).where(Tenant.id == branch_id)
-        )
-        branch = branch_result.scalar_one_or_none()
+        branch = await db.get(Tenant, branch_id)
 
         if not branch:
             logger.warning(f"Branch {branch_id} not found, skipping")
@@ -247,7 +344,7 @@ async def verify_payment(
             active_sub.subscription_start_date = transaction.subscription_start_date
             active_sub.subscription_end_date = transaction.subscription_end_date
             active_sub.last_transaction_id = transaction.id
-            active_sub.updated_at = datetime.utcnow()
+            active_sub.updated_at = now
         else:
             # Create new record
             active_sub = ActiveBranchSubscription(
@@ -273,6 +370,7 @@ async def verify_payment(
     logger.info(f"💰 Expense record created for subscription payment: KES {transaction.amount}")
 
     await db.commit()
+    invalidate_subscription_cache(parent_tenant_id)
 
     logger.info(f"✅ Subscription activated for tenant {tenant.id} with {len(selected_branch_ids)} branches")
 
@@ -280,20 +378,16 @@ async def verify_payment(
     if transaction.main_location_included == False and transaction.num_branches_included == 1:
         # This is a single branch addition with pro-rata payment
         try:
-            from email_service import EmailService
+            from email_service import email_service
 
-            email_service = EmailService()
             branch_id = selected_branch_ids[0]
 
             # Get branch details
-            branch_result = await db.execute(
-                select(Tenant).where(Tenant.id == branch_id)
-            )
-            branch = branch_result.scalar_one_or_none()
+            branch = await db.get(Tenant, branch_id)
 
             if branch and tenant.owner_email:
                 # Calculate days remaining
-                days_remaining = (transaction.subscription_end_date - datetime.utcnow()).days
+                days_remaining = (transaction.subscription_end_date - now).days
 
                 await email_service.send_branch_added_confirmation(
                     tenant_name=tenant.name,
@@ -325,18 +419,11 @@ async def get_subscription_status(
 ):
     """Get current subscription status with per-branch details"""
 
-    # Get user's tenant
-    result = await db.execute(
-        select(Tenant).where(Tenant.id == current_user.tenants[0].id)
-    )
-    tenant = result.scalar_one_or_none()
-
-    if not tenant:
-        raise HTTPException(status_code=404, detail="Tenant not found")
-
-    # Determine parent tenant ID
-    parent_tenant_id = tenant.parent_tenant_id if tenant.parent_tenant_id else tenant.id
+    now = datetime.utcnow()
 
+    # Get user's tenant and its parent (eager-loaded with the user, no query needed)
+    tenant, parent_tenant = _get_user_tenants(current_user)
+    parent_tenant_id = parent_tenant.id
     # Get all branches in the organization
     branches_result = await db.execute(
         select(Tenant).where(
@@ -350,7 +437,7 @@ async def get_subscription_status(
         select(ActiveBranchSubscription).where(
             ActiveBranchSubscription.parent_tenant_id == parent_tenant_id,
             ActiveBranchSubscription.is_active == True,
-            ActiveBranchSubscription.subscription_end_date > datetime.utcnow()
+            ActiveBranchSubscription.subscription_end_date > now
         )
     )
     active_subs = active_subs_result.scalars().all()
@@ -394,12 +481,6 @@ async def get_subscription_status(
         unpaid_branches=unpaid_count
     )
 
-    # Get parent tenant for overall status
-    parent_result = await db.execute(
-        select(Tenant).where(Tenant.id == parent_tenant_id)
-    )
-    parent_tenant = parent_result.scalar_one()
-
     return SubscriptionStatusResponse(
         is_active=parent_tenant.subscription_status in ['trial', 'active'],
         subscription_status=parent_tenant.subscription_status,
@@ -419,18 +500,11 @@ async def get_available_branches(
 ):
     """Get all available branches with subscription status for selection UI"""
 
-    # Get user's tenant
-    result = await db.execute(
-        select(Tenant).where(Tenant.id == current_user.tenants[0].id)
-    )
-    tenant = result.scalar_one_or_none()
-
-    if not tenant:
-        raise HTTPException(status_code=404, detail="Tenant not found")
-
-    # Determine parent tenant ID
-    parent_tenant_id = tenant.parent_tenant_id if tenant.parent_tenant_id else tenant.id
+    now = datetime.utcnow()
 
+    # Get user's tenant and its parent (eager-loaded with the user, no query needed)
+    tenant, parent_tenant = _get_user_tenants(current_user)
+    parent_tenant_id = parent_tenant.id
     # Get all branches in the organization
     branches_result = await db.execute(
         select(Tenant).where(
@@ -444,7 +518,7 @@ async def get_available_branches(
         select(ActiveBranchSubscription).where(
             ActiveBranchSubscription.parent_tenant_id == parent_tenant_id,
             ActiveBranchSubscription.is_active == True,
-            ActiveBranchSubscription.subscription_end_date > datetime.utcnow()
+            ActiveBranchSubscription.subscription_end_date > now
         )
     )
     active_subs = active_subs_result.scalars().all()
@@ -506,23 +580,11 @@ async def add_branch_to_subscription(
 ):
     """Add a branch to existing subscription with pro-rata payment"""
 
-    # Get user's tenant
-    result = await db.execute(
-        select(Tenant).where(Tenant.id == current_user.tenants[0].id)
-    )
-    tenant = result.scalar_one_or_none()
-
-    if not tenant:
-        raise HTTPException(status_code=404, detail="Tenant not found")
-
-    # Determine parent tenant ID
-    parent_tenant_id = tenant.parent_tenant_id if tenant.parent_tenant_id else tenant.id
+    now = datetime.utcnow()
 
-    # Get parent tenant
-    parent_result = await db.execute(
-        select(Tenant).where(Tenant.id == parent_tenant_id)
-    )
-    parent_tenant = parent_result.scalar_one()
+    # Get user's tenant and its parent (eager-loaded with the user, no query needed)
+    tenant, parent_tenant = _get_user_tenants(current_user)
+    parent_tenant_id = parent_tenant.id
 
     # Check parent has active subscription
     if parent_tenant.subscription_status not in ['active', 'trial']:
@@ -559,7 +621,7 @@ async def add_branch_to_subscription(
             ActiveBranchSubscription.parent_tenant_id == parent_tenant_id,
             ActiveBranchSubscription.branch_tenant_id == request.branch_id,
             ActiveBranchSubscription.is_active == True,
-            ActiveBranchSubscription.subscription_end_date > datetime.utcnow()
+            ActiveBranchSubscription.subscription_end_date > now
         )
     )
     existing_sub = existing_sub_result.scalar_one_or_none()
@@ -568,7 +630,7 @@ async def add_branch_to_subscription(
         raise HTTPException(status_code=400, detail="Branch is already subscribed")
 
     # Calculate days remaining in current cycle
-    days_remaining = (billing_end_date - datetime.utcnow()).days
+    days_remaining = (billing_end_date - now).days
 
     if days_remaining <= 0:
         raise HTTPException(status_code=400, detail="Current subscription has expired. Please renew first.")
@@ -594,7 +656,7 @@ async def add_branch_to_subscription(
             billing_cycle=billing_cycle,
             paystack_reference=payment_result['reference'],
             paystack_status='pending',
-            subscription_start_date=datetime.utcnow(),
+            subscription_start_date=now,
             subscription_end_date=billing_end_date,  # Match existing subscription/trial end date
             num_branches_included=1,
             branch_selection_json=json.dumps([request.branch_id]),
@@ -638,9 +700,9 @@ async def get_payment_history(
             "currency": t.currency,
             "billing_cycle": t.billing_cycle,
             "status": t.paystack_status,
-            "payment_date": t.payment_date.isoformat() if t.payment_date else None,
-            "subscription_start_date": t.subscription_start_date.isoformat(),
-            "subscription_end_date": t.subscription_end_date.isoformat(),
+            "payment_date": t.payment_date,
+            "subscription_start_date": t.subscription_start_date,
+            "subscription_end_date": t.subscription_end_date,
             "reference": t.paystack_reference
         }
         for t in transactions
@@ -654,13 +716,8 @@ async def cancel_subscription(
 ):
     """Cancel subscription (will remain active until end of billing period)"""
     
-    result = await db.execute(
-        select(Tenant).where(Tenant.id == current_user.tenants[0].id)
-    )
-    tenant = result.scalar_one_or_none()
-    
-    if not tenant:
-        raise HTTPException(status_code=404, detail="Tenant not found")
+    # Get user's tenant (eager-loaded with the user, no query needed)
+    tenant, _ = _get_user_tenants(current_user)
 
     # Allow cancellation of both 'active' paid subscriptions and 'trial' subscriptions
     if tenant.subscription_status not in ['active', 'trial']:
@@ -668,13 +725,14 @@ async def cancel_subscription(
 
     tenant.subscription_status = 'cancelled'
     await db.commit()
+    invalidate_subscription_cache(tenant.id)
     
     logger.info(f"✅ Subscription cancelled for tenant {tenant.id}")
     
     return {
         "status": True,
         "message": "Subscription cancelled. Access will continue until end of billing period.",
-        "access_until": tenant.next_billing_date.isoformat() if tenant.next_billing_date else None
+        "access_until": tenant.next_billing_date
     }
 
 
@@ -685,19 +743,16 @@ async def reactivate_subscription(
 ):
     """Reactivate a cancelled subscription"""
 
-    result = await db.execute(
-        select(Tenant).where(Tenant.id == current_user.tenants[0].id)
-    )
-    tenant = result.scalar_one_or_none()
+    now = datetime.utcnow()
 
-    if not tenant:
-        raise HTTPException(status_code=404, detail="Tenant not found")
+    # Get user's tenant (eager-loaded with the user, no query needed)
+    tenant, _ = _get_user_tenants(current_user)
 
     if tenant.subscription_status != 'cancelled':
         raise HTTPException(status_code=400, detail="Only cancelled subscriptions can be reactivated")
 
     # Check if subscription hasn't expired yet
-    if tenant.next_billing_date and tenant.next_billing_date < datetime.utcnow():
+    if tenant.next_billing_date and tenant.next_billing_date < now:
         raise HTTPException(
             status_code=400,
             detail="Subscription has expired. Please purchase a new subscription."
@@ -705,12 +760,13 @@ async def reactivate_subscription(
 
     # Reactivate the subscription - restore to original status (trial or active)
     # If trial_ends_at exists and hasn't passed, restore to 'trial', otherwise 'active'
-    if tenant.trial_ends_at and tenant.trial_ends_at > datetime.utcnow():
+    if tenant.trial_ends_at and tenant.trial_ends_at > now:
         tenant.subscription_status = 'trial'
     else:
         tenant.subscription_status = 'active'
 
     await db.commit()
+    invalidate_subscription_cache(tenant.id)
 
     logger.info(f"✅ Subscription reactivated for tenant {tenant.id} (status: {tenant.subscription_status})")
 
@@ -718,7 +774,7 @@ async def reactivate_subscription(
         "status": True,
         "message": "Subscription reactivated successfully!",
         "subscription_status": tenant.subscription_status,
-        "next_billing_date": tenant.next_billing_date.isoformat() if tenant.next_billing_date else None
+        "next_billing_date": tenant.next_billing_date
     }
 
 
@@ -730,23 +786,11 @@ async def cancel_branch_subscription(
 ):
     """Cancel subscription for a specific branch (will remain active until end of billing period)"""
 
-    # Get the user's tenant (could be parent or branch)
-    if not current_user.tenants:
-        raise HTTPException(status_code=404, detail="User has no associated tenant")
-
-    user_tenant = current_user.tenants[0]
+    now = datetime.utcnow()
 
-    # Determine parent tenant ID (if user_tenant is branch, use its parent; otherwise use itself)
-    parent_tenant_id = user_tenant.parent_tenant_id if user_tenant.parent_tenant_id else user_tenant.id
-
-    # Get parent tenant object
-    parent_result = await db.execute(
-        select(Tenant).where(Tenant.id == parent_tenant_id)
-    )
-    parent_tenant = parent_result.scalar_one_or_none()
-
-    if not parent_tenant:
-        raise HTTPException(status_code=404, detail="Parent organization not found")
+    # Get the user's tenant (could be parent or branch) and its parent organization
+    user_tenant, parent_tenant = _get_user_tenants(current_user)
+    parent_tenant_id = parent_tenant.id
 
     # Verify the branch belongs to this organization (either IS the main location OR has matching parent_tenant_id)
     branch_result = await db.execute(
@@ -778,17 +822,13 @@ async def cancel_branch_subscription(
 
     # Mark as cancelled
     active_sub.is_cancelled = True
-    active_sub.cancelled_at = datetime.utcnow()
+    active_sub.cancelled_at = now
 
-    # Remove from saved_branch_selection_json for auto-renewal
-    if parent_tenant.saved_branch_selection_json:
-        try:
-            saved_branches = json.loads(parent_tenant.saved_branch_selection_json)
-            if branch_tenant_id in saved_branches:
-                saved_branches.remove(branch_tenant_id)
-                parent_tenant.saved_branch_selection_json = json.dumps(saved_branches)
-        except (json.JSONDecodeError, ValueError) as e:
-            logger.warning(f"Failed to update saved_branch_selection_json: {e}")
+    # Remove from saved_branch_selection_json for auto-renewal (JSONB array, no re-parsing needed)
+    saved_branches = set(parent_tenant.saved_branch_selection_json or [])
+    if branch_tenant_id in saved_branches:
+        saved_branches.discard(branch_tenant_id)
+        parent_tenant.saved_branch_selection_json = sorted(saved_branches)
 
     await db.commit()
 
@@ -800,7 +840,7 @@ async def cancel_branch_subscription(
     return {
         "status": True,
         "message": "Branch subscription cancelled. Access will continue until end of billing period.",
-        "access_until": active_sub.subscription_end_date.isoformat() if active_sub.subscription_end_date else None,
+        "access_until": active_sub.subscription_end_date,
         "is_main_location": is_main_location,
         "branch_name": branch_tenant.name
     }
@@ -814,23 +854,11 @@ async def reactivate_branch_subscription(
 ):
     """Reactivate a cancelled branch subscription (must not be expired)"""
 
-    # Get the user's tenant (could be parent or branch)
-    if not current_user.tenants:
-        raise HTTPException(status_code=404, detail="User has no associated tenant")
-
-    user_tenant = current_user.tenants[0]
+    now = datetime.utcnow()
 
-    # Determine parent tenant ID (if user_tenant is branch, use its parent; otherwise use itself)
-    parent_tenant_id = user_tenant.parent_tenant_id if user_tenant.parent_tenant_id else user_tenant.id
-
-    # Get parent tenant object
-    parent_result = await db.execute(
-        select(Tenant).where(Tenant.id == parent_tenant_id)
-    )
-    parent_tenant = parent_result.scalar_one_or_none()
-
-    if not parent_tenant:
-        raise HTTPException(status_code=404, detail="Parent organization not found")
+    # Get the user's tenant (could be parent or branch) and its parent organization
+    user_tenant, parent_tenant = _get_user_tenants(current_user)
+    parent_tenant_id = parent_tenant.id
 
     # Verify the branch belongs to this organization (either IS the main location OR has matching parent_tenant_id)
     branch_result = await db.execute(
@@ -861,7 +889,7 @@ async def reactivate_branch_subscription(
         raise HTTPException(status_code=400, detail="Branch subscription is not cancelled")
 
     # Validate subscription hasn't expired
-    if active_sub.subscription_end_date < datetime.utcnow():
+    if active_sub.subscription_end_date < now:
         raise HTTPException(
             status_code=400,
             detail="Branch subscription has expired. Please renew or add it to your subscription."
@@ -872,17 +900,11 @@ async def reactivate_branch_subscription(
     active_sub.cancelled_at = None
 
     # Add back to saved_branch_selection_json for auto-renewal
-    if parent_tenant.saved_branch_selection_json:
-        try:
-            saved_branches = json.loads(parent_tenant.saved_branch_selection_json)
-            if branch_tenant_id not in saved_branches:
-                saved_branches.append(branch_tenant_id)
-                parent_tenant.saved_branch_selection_json = json.dumps(saved_branches)
-        except (json.JSONDecodeError, ValueError) as e:
-            logger.warning(f"Failed to update saved_branch_selection_json: {e}")
-    else:
-        # Create new saved selection with just this branch
-        parent_tenant.saved_branch_selection_json = json.dumps([branch_tenant_id])
+    # (creates a new saved selection with just this branch if none exists)
+    saved_branches = set(parent_tenant.saved_branch_selection_json or [])
+    if branch_tenant_id not in saved_branches:
+        saved_branches.add(branch_tenant_id)
+        parent_tenant.saved_branch_selection_json = sorted(saved_branches)
 
     await db.commit()
 
@@ -891,7 +913,7 @@ async def reactivate_branch_subscription(
     return {
         "status": True,
         "message": "Branch subscription reactivated successfully!",
-        "subscription_end_date": active_sub.subscription_end_date.isoformat() if active_sub.subscription_end_date else None,
+        "subscription_end_date": active_sub.subscription_end_date,
         "branch_name": branch_tenant.name
     }
 
@@ -913,23 +935,12 @@ async def upgrade_subscription(
     Calculates remaining value of current subscription and applies it as credit
     toward the new longer-term plan.
     """
-    # Get user's tenant
-    result = await db.execute(
-        select(Tenant).where(Tenant.id == current_user.tenants[0].id)
-    )
-    tenant = result.scalar_one_or_none()
-
-    if not tenant:
-        raise HTTPException(status_code=404, detail="Tenant not found")
 
-    # Determine parent tenant ID
-    parent_tenant_id = tenant.parent_tenant_id if tenant.parent_tenant_id else tenant.id
+    now = datetime.utcnow()
 
-    # Get parent tenant
-    parent_result = await db.execute(
-        select(Tenant).where(Tenant.id == parent_tenant_id)
-    )
-    parent_tenant = parent_result.scalar_one()
+    # Get user's tenant and its parent (eager-loaded with the user, no query needed)
+    tenant, parent_tenant = _get_user_tenants(current_user)
+    parent_tenant_id = parent_tenant.id
 
     # Check if tenant has an active subscription
     if parent_tenant.subscription_status not in ['active', 'trial']:
@@ -942,12 +953,10 @@ async def upgrade_subscription(
     new_billing_cycle = request.new_billing_cycle
 
     # Validate new billing cycle is longer than current
-    cycle_order = {'monthly': 1, 'quarterly': 2, 'semi_annual': 3, 'annual': 4}
-
-    if new_billing_cycle not in cycle_order:
+    if new_billing_cycle not in _CYCLE_ORDER:
         raise HTTPException(status_code=400, detail=f"Invalid billing cycle: {new_billing_cycle}")
 
-    if current_billing_cycle and cycle_order.get(current_billing_cycle, 0) >= cycle_order[new_billing_cycle]:
+    if current_billing_cycle and _CYCLE_ORDER.get(current_billing_cycle, 0) >= _CYCLE_ORDER[new_billing_cycle]:
         raise HTTPException(
             status_code=400,
             detail=f"Cannot upgrade from {current_billing_cycle} to {new_billing_cycle}. New plan must be longer."
@@ -964,14 +973,14 @@ async def upgrade_subscription(
     if parent_tenant.subscription_status == 'trial':
         if not parent_tenant.trial_ends_at:
             raise HTTPException(status_code=400, detail="Trial period not configured.")
-        days_remaining = max(0, (parent_tenant.trial_ends_at - datetime.utcnow()).days)
+        days_remaining = max(0, (parent_tenant.trial_ends_at - now).days)
         # For trial, no credit is given - they pay full price
         remaining_value_kobo = 0
     else:
         if not parent_tenant.next_billing_date:
             raise HTTPException(status_code=400, detail="No billing date found.")
 
-        days_remaining = max(0, (parent_tenant.next_billing_date - datetime.utcnow()).days)
+        days_remaining = max(0, (parent_tenant.next_billing_date - now).days)
 
         # Calculate remaining value from current subscription
         if current_plan:
@@ -983,35 +992,20 @@ async def upgrade_subscription(
 
     # Get active branch subscriptions to determine how many branches to include
     active_subs_result = await db.execute(
-        select(ActiveBranchSubscription).where(
+        select(ActiveBranchSubscription.branch_tenant_id).where(
             ActiveBranchSubscription.parent_tenant_id == parent_tenant_id,
             ActiveBranchSubscription.is_active == True,
             ActiveBranchSubscription.is_cancelled == False
         )
     )
-    active_subs = active_subs_result.scalars().all()
-    selected_branch_ids = [sub.branch_tenant_id for sub in active_subs]
+    selected_branch_ids = list(active_subs_result.scalars().all())
 
     if not selected_branch_ids:
         # Default to just the main location
         selected_branch_ids = [parent_tenant_id]
 
-    # Get branches data for pricing calculation
-    branches_result = await db.execute(
-        select(Tenant).where(Tenant.id.in_(selected_branch_ids))
-    )
-    branches = branches_result.scalars().all()
-    branches_data = [
-        {"id": b.id, "name": b.name, "is_main": (b.id == parent_tenant_id)}
-        for b in branches
-    ]
-
     # Calculate new plan cost
-    pricing = paystack_service.calculate_total_for_selected_branches(
-        new_billing_cycle,
-        selected_branch_ids,
-        branches_data
-    )
+    pricing = await _price_selected_branches(db, new_billing_cycle, selected_branch_ids, parent_tenant_id)
 
     new_plan_cost_kobo = pricing['total_amount_kobo']
 
@@ -1039,8 +1033,8 @@ async def upgrade_subscription(
                 billing_cycle=new_billing_cycle,
                 paystack_reference=payment_result['reference'],
                 paystack_status='pending',
-                subscription_start_date=datetime.utcnow(),
-                subscription_end_date=datetime.utcnow() + timedelta(days=new_plan['duration_days']),
+                subscription_start_date=now,
+                subscription_end_date=now + timedelta(days=new_plan['duration_days']),
                 num_branches_included=len(selected_branch_ids),
                 branch_selection_json=json.dumps(selected_branch_ids),
                 main_location_included=True
@@ -1069,11 +1063,18 @@ async def upgrade_subscription(
     else:
         # Credit covers the entire new plan - activate immediately
         parent_tenant.billing_cycle = new_billing_cycle
-        parent_tenant.next_billing_date = datetime.utcnow() + timedelta(days=new_plan['duration_days'])
+        parent_tenant.next_billing_date = now + timedelta(days=new_plan['duration_days'])
 
-        # Update active branch subscriptions
-        for active_sub in active_subs:
-            active_sub.subscription_end_date = parent_tenant.next_billing_date
+        # Update active branch subscriptions in a single statement
+        await db.execute(
+            update(ActiveBranchSubscription)
+            .where(
+                ActiveBranchSubscription.parent_tenant_id == parent_tenant_id,
+                ActiveBranchSubscription.is_active == True,
+                ActiveBranchSubscription.is_cancelled == False
+            )
+            .values(subscription_end_date=parent_tenant.next_billing_date)
+        )
 
         await db.commit()
 
@@ -1085,7 +1086,7 @@ async def upgrade_subscription(
             "upgrade_details": {
                 "current_plan": current_billing_cycle,
                 "new_plan": new_billing_cycle,
-                "new_end_date": parent_tenant.next_billing_date.isoformat(),
+                "new_end_date": parent_tenant.next_billing_date,
                 "credit_used_kes": remaining_value_kobo / 100
             }
         }
@@ -1101,30 +1102,17 @@ async def preview_upgrade(
     Preview upgrade costs without initiating payment.
     Shows pro-rata calculation for upgrading to a longer billing cycle.
     """
-    # Get user's tenant
-    result = await db.execute(
-        select(Tenant).where(Tenant.id == current_user.tenants[0].id)
-    )
-    tenant = result.scalar_one_or_none()
 
-    if not tenant:
-        raise HTTPException(status_code=404, detail="Tenant not found")
+    now = datetime.utcnow()
 
-    # Determine parent tenant ID
-    parent_tenant_id = tenant.parent_tenant_id if tenant.parent_tenant_id else tenant.id
-
-    # Get parent tenant
-    parent_result = await db.execute(
-        select(Tenant).where(Tenant.id == parent_tenant_id)
-    )
-    parent_tenant = parent_result.scalar_one()
+    # Get user's tenant and its parent (eager-loaded with the user, no query needed)
+    tenant, parent_tenant = _get_user_tenants(current_user)
+    parent_tenant_id = parent_tenant.id
 
     current_billing_cycle = parent_tenant.billing_cycle
 
     # Validate new billing cycle
-    cycle_order = {'monthly': 1, 'quarterly': 2, 'semi_annual': 3, 'annual': 4}
-
-    if new_billing_cycle not in cycle_order:
+    if new_billing_cycle not in _CYCLE_ORDER:
         raise HTTPException(status_code=400, detail=f"Invalid billing cycle: {new_billing_cycle}")
 
     current_plan = SUBSCRIPTION_PLANS.get(current_billing_cycle) if current_billing_cycle else None
@@ -1140,16 +1128,16 @@ async def preview_upgrade(
     if parent_tenant.subscription_status not in ['active', 'trial']:
         can_upgrade = False
         upgrade_message = "No active subscription. Please subscribe first."
-    elif current_billing_cycle and cycle_order.get(current_billing_cycle, 0) >= cycle_order[new_billing_cycle]:
+    elif current_billing_cycle and _CYCLE_ORDER.get(current_billing_cycle, 0) >= _CYCLE_ORDER[new_billing_cycle]:
         can_upgrade = False
         upgrade_message = f"Already on {current_billing_cycle} plan or longer."
 
     # Calculate days remaining
     if parent_tenant.subscription_status == 'trial':
-        days_remaining = max(0, (parent_tenant.trial_ends_at - datetime.utcnow()).days) if parent_tenant.trial_ends_at else 0
+        days_remaining = max(0, (parent_tenant.trial_ends_at - now).days) if parent_tenant.trial_ends_at else 0
         remaining_value_kobo = 0
     elif parent_tenant.next_billing_date:
-        days_remaining = max(0, (parent_tenant.next_billing_date - datetime.utcnow()).days)
+        days_remaining = max(0, (parent_tenant.next_billing_date - now).days)
         if current_plan:
             total_days = current_plan['duration_days']
             current_amount = current_plan['amount']
@@ -1162,31 +1150,16 @@ async def preview_upgrade(
 
     # Get active branches
     active_subs_result = await db.execute(
-        select(ActiveBranchSubscription).where(
+        select(ActiveBranchSubscription.branch_tenant_id).where(
             ActiveBranchSubscription.parent_tenant_id == parent_tenant_id,
             ActiveBranchSubscription.is_active == True,
             ActiveBranchSubscription.is_cancelled == False
         )
     )
-    active_subs = active_subs_result.scalars().all()
-    selected_branch_ids = [sub.branch_tenant_id for sub in active_subs] or [parent_tenant_id]
-
-    # Get branches data
-    branches_result = await db.execute(
-        select(Tenant).where(Tenant.id.in_(selected_branch_ids))
-    )
-    branches = branches_result.scalars().all()
-    branches_data = [
-        {"id": b.id, "name": b.name, "is_main": (b.id == parent_tenant_id)}
-        for b in branches
-    ]
+    selected_branch_ids = list(active_subs_result.scalars().all()) or [parent_tenant_id]
 
     # Calculate new plan cost
-    pricing = paystack_service.calculate_total_for_selected_branches(
-        new_billing_cycle,
-        selected_branch_ids,
-        branches_data
-    )
+    pricing = await _price_selected_branches(db, new_billing_cycle, selected_branch_ids, parent_tenant_id)
 
     new_plan_cost_kobo = pricing['total_amount_kobo']
     amount_to_pay_kobo = max(0, new_plan_cost_kobo - remaining_value_kobo)
@@ -1210,37 +1183,8 @@ async def preview_upgrade(
 @router.get("/plans")
 async def get_available_plans():
     """Get all available subscription plans with monthly equivalent pricing"""
-
-    # Savings map based on KES 2,000/month base price
-    # Monthly: KES 2,000 x 1 = KES 2,000 (0 savings)
-    # Quarterly: KES 2,000 x 3 = KES 6,000 - KES 5,400 = KES 600 savings
-    # Semi-annual: KES 2,000 x 6 = KES 12,000 - KES 9,720 = KES 2,280 savings
-    # Annual: KES 2,000 x 12 = KES 24,000 - KES 18,360 = KES 5,640 savings
-    savings_map = {
-        'monthly': 0,
-        'quarterly': 600,
-        'semi_annual': 2280,
-        'annual': 5640
-    }
-
-    return {
-        "plans": [
-            {
-                "id": key,
-                "name": plan['name'],
-                "amount": plan['amount'] / 100,  # Convert to KES (total price)
-                "amount_kobo": plan['amount'],
-                "monthly_equivalent": plan.get('monthly_equivalent', plan['amount'] / 100),
-                "interval": plan['interval'],
-                "duration_days": plan['duration_days'],
-                "description": plan['description'],
-                "savings": savings_map.get(key, 0)
-            }
-            for key, plan in SUBSCRIPTION_PLANS.items()
-        ],
-        "currency": "KES",
-        "trial_period_days": settings.TRIAL_PERIOD_DAYS
-    }
+    # Plans are process-constant, so the serialized body is built once at import
+    return Response(content=_PLANS_RESPONSE_JSON, media_type="application/json")
 
 
 @router.get("/calculate-price/{billing_cycle}")
@@ -1251,14 +1195,8 @@ async def calculate_price(
 ):
     """Calculate subscription price including branches (80% discount per branch)"""
     
-    # Get user's tenant
-    result = await db.execute(
-        select(Tenant).where(Tenant.id == current_user.tenants[0].id)
-    )
-    tenant = result.scalar_one_or_none()
-    
-    if not tenant:
-        raise HTTPException(status_code=404, detail="Tenant not found")
+    # Get user's tenant (eager-loaded with the user, no query needed)
+    tenant, _ = _get_user_tenants(current_user)
     
     # Count number of branches
     branch_count_result = await db.execute(
@@ -1274,6 +1212,42 @@ async def calculate_price(
 
 # ==================== AUTO-RENEWAL ENDPOINTS ====================
 
+# Plan codes known to exist on Paystack, created by this process or reported as
+# already existing. A plan code encodes the cycle, branch count and amount, so
+# once it exists it never needs creating again.
+_created_plan_codes: set = set()
+# One lock per plan code (a handful per process), so concurrent requests for the
+# same plan share a single Paystack call without making other plans wait on it
+_plan_code_locks: Dict[str, asyncio.Lock] = {}
+
+
+def _plan_already_exists(result: dict) -> bool:
+    """Whether a failed plan creation means Paystack already has this plan code"""
+    message = (result.get('message') or '').lower()
+    return 'already exist' in message or 'duplicate' in message
+
+
+async def _ensure_subscription_plan(plan_code: str, name: str, amount: int, interval: str) -> None:
+    """Create the Paystack plan unless it already exists, saving a Paystack round-trip"""
+    if plan_code in _created_plan_codes:
+        return
+
+    lock = _plan_code_locks.setdefault(plan_code, asyncio.Lock())
+    async with lock:
+        # Another request may have created it while we waited
+        if plan_code in _created_plan_codes:
+            return
+
+        result = await paystack_service.create_subscription_plan(
+            plan_code=plan_code,
+            name=name,
+            amount=amount,
+            interval=interval
+        )
+        if result['status'] or _plan_already_exists(result):
+            _created_plan_codes.add(plan_code)
+
+
 @router.post("/enable-auto-renewal")
 async def enable_auto_renewal(
     current_user: User = Depends(get_current_user),
@@ -1284,26 +1258,15 @@ async def enable_auto_renewal(
     Creates a Paystack subscription for automatic recurring payments.
     Requires an active subscription with saved payment authorization.
     """
-    # Get user's tenant (parent)
-    result = await db.execute(
-        select(Tenant).where(Tenant.id == current_user.tenants[0].id)
-    )
-    tenant = result.scalar_one_or_none()
-
-    if not tenant:
-        raise HTTPException(status_code=404, detail="Tenant not found")
 
-    parent_tenant_id = tenant.parent_tenant_id or tenant.id
+    now = datetime.utcnow()
 
-    # Get parent tenant
-    if parent_tenant_id != tenant.id:
-        result = await db.execute(
-            select(Tenant).where(Tenant.id == parent_tenant_id)
-        )
-        tenant = result.scalar_one()
+    # Auto-renewal is managed on the parent tenant, which is already loaded with the user
+    _, tenant = _get_user_tenants(current_user)
+    parent_tenant_id = tenant.id
 
     # Check if tenant has an active subscription
-    if not tenant.next_billing_date or tenant.next_billing_date <= datetime.utcnow():
+    if not tenant.next_billing_date or tenant.next_billing_date <= now:
         raise HTTPException(
             status_code=400,
             detail="No active subscription found. Please subscribe first before enabling auto-renewal."
@@ -1316,60 +1279,45 @@ async def enable_auto_renewal(
             detail="Auto-renewal is already enabled for this subscription."
         )
 
-    # Get the last successful transaction to retrieve authorization code
-    last_tx_result = await db.execute(
-        select(SubscriptionTransaction).where(
-            SubscriptionTransaction.tenant_id == parent_tenant_id,
-            SubscriptionTransaction.paystack_status == 'success',
-            SubscriptionTransaction.paystack_authorization_code.isnot(None)
-        ).order_by(SubscriptionTransaction.created_at.desc()).limit(1)
-    )
-    last_transaction = last_tx_result.scalar_one_or_none()
-
-    if not last_transaction or not last_transaction.paystack_authorization_code:
-        raise HTTPException(
-            status_code=400,
-            detail="No saved payment method found. Please make a payment first to enable auto-renewal."
-        )
-
     # Get saved branch selection or use current active branches
     if tenant.saved_branch_selection_json:
-        saved_branch_ids = json.loads(tenant.saved_branch_selection_json)
+        saved_branch_ids = list(tenant.saved_branch_selection_json)
     else:
         # Use current active branch subscriptions (excluding cancelled branches)
         active_subs_result = await db.execute(
-            select(ActiveBranchSubscription).where(
+            select(ActiveBranchSubscription.branch_tenant_id).where(
                 ActiveBranchSubscription.parent_tenant_id == parent_tenant_id,
                 ActiveBranchSubscription.is_active == True,
                 ActiveBranchSubscription.is_cancelled == False
             )
         )
-        active_subs = active_subs_result.scalars().all()
-        saved_branch_ids = [sub.branch_tenant_id for sub in active_subs]
+        saved_branch_ids = list(active_subs_result.scalars().all())
 
     # Calculate subscription amount
-    branches_result = await db.execute(
-        select(Tenant).where(
-            Tenant.id.in_(saved_branch_ids)
-        )
-    )
-    branches = branches_result.scalars().all()
-    branches_data = [
-        {"id": b.id, "name": b.name, "is_main": (b.id == parent_tenant_id)}
-        for b in branches
-    ]
-
-    pricing = paystack_service.calculate_total_for_selected_branches(
-        tenant.billing_cycle,
-        saved_branch_ids,
-        branches_data
-    )
+    pricing = await _price_selected_branches(db, tenant.billing_cycle, saved_branch_ids, parent_tenant_id)
 
     # Create or get Paystack plan
     plan_code = f"{tenant.billing_cycle}-{len(saved_branch_ids)}branches-{pricing['total_amount_kobo']}"
 
-    # Try to create plan (will fail silently if already exists)
-    await paystack_service.create_subscription_plan(
+    # Get the saved authorization first - without one there is nothing to subscribe,
+    # so no Paystack plan should be created
+    last_tx_result = await db.execute(
+        select(SubscriptionTransaction).where(
+            SubscriptionTransaction.tenant_id == parent_tenant_id,
+            SubscriptionTransaction.paystack_status == 'success',
+            SubscriptionTransaction.paystack_authorization_code.isnot(None)
+        ).order_by(SubscriptionTransaction.created_at.desc()).limit(1)
+    )
+    last_transaction = last_tx_result.scalar_one_or_none()
+
+    if not last_transaction or not last_transaction.paystack_authorization_code:
+        raise HTTPException(
+            status_code=400,
+            detail="No saved payment method found. Please make a payment first to enable auto-renewal."
+        )
+
+    # Create the plan on Paystack (skipped if it's already known to exist)
+    await _ensure_subscription_plan(
         plan_code=plan_code,
         name=f"{tenant.billing_cycle.title()} Plan - {len(saved_branch_ids)} Branch(es)",
         amount=pricing['total_amount_kobo'],
@@ -1393,7 +1341,7 @@ async def enable_auto_renewal(
     tenant.auto_renewal_enabled = True
     tenant.paystack_subscription_code = subscription_result['subscription_code']
     tenant.paystack_plan_code = plan_code
-    tenant.saved_branch_selection_json = json.dumps(saved_branch_ids)
+    tenant.saved_branch_selection_json = saved_branch_ids
 
     await db.commit()
 
@@ -1429,23 +1377,9 @@ async def disable_auto_renewal(
     Disable auto-renewal for current subscription.
     Cancels the Paystack subscription but keeps current access until expiry.
     """
-    # Get user's tenant (parent)
-    result = await db.execute(
-        select(Tenant).where(Tenant.id == current_user.tenants[0].id)
-    )
-    tenant = result.scalar_one_or_none()
-
-    if not tenant:
-        raise HTTPException(status_code=404, detail="Tenant not found")
-
-    parent_tenant_id = tenant.parent_tenant_id or tenant.id
-
-    # Get parent tenant
-    if parent_tenant_id != tenant.id:
-        result = await db.execute(
-            select(Tenant).where(Tenant.id == parent_tenant_id)
-        )
-        tenant = result.scalar_one()
+    # Auto-renewal is managed on the parent tenant, which is already loaded with the user
+    _, tenant = _get_user_tenants(current_user)
+    parent_tenant_id = tenant.id
 
     # Check if auto-renewal is enabled
     if not tenant.auto_renewal_enabled or not tenant.paystack_subscription_code:
@@ -1488,28 +1422,11 @@ async def get_auto_renewal_status(
     """
     Get auto-renewal status for current subscription.
     """
-    # Get user's tenant (parent)
-    result = await db.execute(
-        select(Tenant).where(Tenant.id == current_user.tenants[0].id)
-    )
-    tenant = result.scalar_one_or_none()
-
-    if not tenant:
-        raise HTTPException(status_code=404, detail="Tenant not found")
-
-    parent_tenant_id = tenant.parent_tenant_id or tenant.id
-
-    # Get parent tenant
-    if parent_tenant_id != tenant.id:
-        result = await db.execute(
-            select(Tenant).where(Tenant.id == parent_tenant_id)
-        )
-        tenant = result.scalar_one()
+    # Auto-renewal is managed on the parent tenant, which is already loaded with the user
+    _, tenant = _get_user_tenants(current_user)
 
     # Get saved branch selection
-    saved_branch_ids = []
-    if tenant.saved_branch_selection_json:
-        saved_branch_ids = json.loads(tenant.saved_branch_selection_json)
+    saved_branch_ids = tenant.saved_branch_selection_json or []
 
     response = {
         "auto_renewal_enabled": tenant.auto_renewal_enabled or False,
@@ -1545,15 +1462,12 @@ async def get_payment_config_status(
     Returns diagnostic information without exposing actual API keys.
     Useful for troubleshooting "Invalid key" errors.
     """
-    # Get user's tenant and verify admin role
-    if not current_user.tenants:
-        raise HTTPException(status_code=404, detail="User has no associated tenant")
-
-    user_tenant = current_user.tenants[0]
-    parent_tenant_id = user_tenant.parent_tenant_id if user_tenant.parent_tenant_id else user_tenant.id
+    # Get user's organization (eager-loaded with the user, no query needed)
+    _, parent_tenant = _get_user_tenants(current_user)
+    parent_tenant_id = parent_tenant.id
 
     # Check if user is admin (simple check - could be enhanced with proper RBAC)
-    from models import tenant_users, UserRole
+    # This membership lookup is the only query the endpoint issues
     result = await db.execute(
         select(tenant_users.c.role).where(
             tenant_users.c.tenant_id == parent_tenant_id,
@@ -1583,40 +1497,50 @@ async def get_payment_config_status(
     }
 
 
+# Static recommendations for each Paystack configuration state
+_CONFIG_RECOMMENDATIONS = MappingProxyType({
+    'not_configured': MappingProxyType({
+        "severity": "error",
+        "message": "Paystack API keys are not configured",
+        "action": "Set PAYSTACK_SECRET_KEY and PAYSTACK_PUBLIC_KEY environment variables in Render dashboard"
+    }),
+    'credentials_invalid': MappingProxyType({
+        "severity": "error",
+        "message": "Paystack credentials failed verification",
+        "action": "Check if keys are correct and not expired in Paystack dashboard"
+    }),
+    'test_mode': MappingProxyType({
+        "severity": "info",
+        "message": "Paystack is running in TEST mode",
+        "action": "Switch to LIVE keys for production payments"
+    }),
+    'configured': MappingProxyType({
+        "severity": "success",
+        "message": "Paystack is properly configured",
+        "action": None
+    }),
+})
+
+
 def _get_config_recommendations(config_status: dict, credentials_valid: Optional[bool]) -> list:
     """Generate helpful recommendations based on configuration status"""
-    recommendations = []
-
     if not config_status['is_configured']:
-        recommendations.append({
-            "severity": "error",
-            "message": "Paystack API keys are not configured",
-            "action": "Set PAYSTACK_SECRET_KEY and PAYSTACK_PUBLIC_KEY environment variables in Render dashboard"
-        })
+        state = 'not_configured'
     elif config_status['has_issues']:
-        for issue in config_status['issues']:
-            recommendations.append({
+        # One recommendation per reported issue
+        return [
+            {
                 "severity": "warning",
                 "message": issue,
                 "action": "Review and correct the Paystack key configuration in Render dashboard"
-            })
+            }
+            for issue in config_status['issues']
+        ]
     elif credentials_valid is False:
-        recommendations.append({
-            "severity": "error",
-            "message": "Paystack credentials failed verification",
-            "action": "Check if keys are correct and not expired in Paystack dashboard"
-        })
+        state = 'credentials_invalid'
     elif config_status['mode'] == 'test':
-        recommendations.append({
-            "severity": "info",
-            "message": "Paystack is running in TEST mode",
-            "action": "Switch to LIVE keys for production payments"
-        })
+        state = 'test_mode'
     else:
-        recommendations.append({
-            "severity": "success",
-            "message": "Paystack is properly configured",
-            "action": None
-        })
+        state = 'configured'
 
-    return recommendations
+    return [dict(_CONFIG_RECOMMENDATIONS[state])]
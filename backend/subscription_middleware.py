@@ -5,9 +5,11 @@ Enforces read-only access for unpaid branches
 
 from fastapi import HTTPException, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from datetime import datetime
+from sqlalchemy import select, exists
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
 import logging
+import time
 
 from database import get_db
 from models import Tenant, ActiveBranchSubscription
@@ -16,6 +18,46 @@ from auth import get_current_tenant
 logger = logging.getLogger(__name__)
 
 
+# ============================================================================
+# SUBSCRIPTION DECISION CACHE
+# ============================================================================
+# The write-access decision for a branch only changes on payment, cancellation,
+# manual block/unblock or expiry, so it is cached per process keyed by
+# (parent_tenant_id, branch_tenant_id). Entries never outlive the trial or
+# subscription end date they were computed from, and every code path that
+# changes those inputs calls invalidate_subscription_cache().
+# That invalidation only reaches the worker that handled the change, so the
+# TTLs are kept to a few seconds: a block, cancel or revoke reaches every
+# other worker within SUBSCRIPTION_CACHE_TTL_SECONDS, while bursts of writes
+# from one branch still share a single check.
+SUBSCRIPTION_CACHE_TTL_SECONDS = 5
+SUBSCRIPTION_DENIED_CACHE_TTL_SECONDS = 5
+
+# (parent_tenant_id, branch_tenant_id) -> (expires_at, status_code, detail)
+# status_code is None when writes are allowed
+_subscription_cache: Dict[Tuple[int, int], Tuple[float, Optional[int], Optional[str]]] = {}
+
+
+def invalidate_subscription_cache(parent_tenant_id: int) -> None:
+    """Drop cached subscription decisions for every branch of an organization"""
+    for key in [k for k in _subscription_cache if k[0] == parent_tenant_id]:
+        _subscription_cache.pop(key, None)
+
+
+def _cache_decision(
+    key: Tuple[int, int],
+    status_code: Optional[int],
+    detail: Optional[str] = None,
+    valid_for: Optional[timedelta] = None
+) -> None:
+    """Store a decision, capped by how long it remains true"""
+    ttl = SUBSCRIPTION_CACHE_TTL_SECONDS if status_code is None else SUBSCRIPTION_DENIED_CACHE_TTL_SECONDS
+    if valid_for is not None:
+        ttl = min(ttl, valid_for.total_seconds())
+    if ttl > 0:
+        _subscription_cache[key] = (time.monotonic() + ttl, status_code, detail)
+
+
 async def check_branch_subscription_active(
     current_tenant: Tenant = Depends(get_current_tenant),
     db: AsyncSession = Depends(get_db)
@@ -36,12 +78,25 @@ async def check_branch_subscription_active(
     # Determine parent tenant ID
     parent_tenant_id = current_tenant.parent_tenant_id if current_tenant.parent_tenant_id else current_tenant.id
     current_branch_id = current_tenant.id
+    cache_key = (parent_tenant_id, current_branch_id)
+
+    # Serve the decision from cache when it is still fresh
+    cached = _subscription_cache.get(cache_key)
+    if cached and cached[0] > time.monotonic():
+        if cached[1] is not None:
+            raise HTTPException(status_code=cached[1], detail=cached[2])
+        return current_tenant
+
+    # Single timestamp for every comparison in this check
+    now = datetime.utcnow()
 
     # Get parent tenant to check overall subscription status
-    parent_result = await db.execute(
-        select(Tenant).where(Tenant.id == parent_tenant_id)
-    )
-    parent_tenant = parent_result.scalar_one_or_none()
+    # Single-location organizations are their own parent; for branches, get_current_user
+    # already loaded the parent into this session, so the identity map usually answers
+    if not current_tenant.parent_tenant_id:
+        parent_tenant = current_tenant
+    else:
+        parent_tenant = await db.get(Tenant, parent_tenant_id)
 
     if not parent_tenant:
         raise HTTPException(
@@ -52,36 +107,36 @@ async def check_branch_subscription_active(
     # Check if parent tenant is manually blocked by super admin
     if parent_tenant.is_manually_blocked:
         logger.warning(f"Write operation blocked for manually blocked tenant {parent_tenant_id}")
-        raise HTTPException(
-            status_code=403,
-            detail="Your account has been blocked due to subscription issues. Please contact support or renew your subscription."
-        )
+        detail = "Your account has been blocked due to subscription issues. Please contact support or renew your subscription."
+        _cache_decision(cache_key, 403, detail)
+        raise HTTPException(status_code=403, detail=detail)
 
     # If in trial period, allow all operations
     if parent_tenant.subscription_status == 'trial':
-        if parent_tenant.trial_ends_at and parent_tenant.trial_ends_at > datetime.utcnow():
+        if parent_tenant.trial_ends_at and parent_tenant.trial_ends_at > now:
+            _cache_decision(cache_key, None, valid_for=parent_tenant.trial_ends_at - now)
             return current_tenant
 
     # Check if this specific branch has active subscription
     active_sub_result = await db.execute(
-        select(ActiveBranchSubscription).where(
+        select(ActiveBranchSubscription.subscription_end_date).where(
             ActiveBranchSubscription.parent_tenant_id == parent_tenant_id,
             ActiveBranchSubscription.branch_tenant_id == current_branch_id,
             ActiveBranchSubscription.is_active == True,
-            ActiveBranchSubscription.subscription_end_date > datetime.utcnow()
+            ActiveBranchSubscription.subscription_end_date > now
         )
     )
-    active_sub = active_sub_result.scalar_one_or_none()
+    subscription_end_date = active_sub_result.scalars().first()
 
-    if not active_sub:
+    if not subscription_end_date:
         # Branch subscription is inactive - block write operations
         logger.warning(f"Write operation blocked for unpaid branch {current_branch_id}")
-        raise HTTPException(
-            status_code=403,
-            detail="This branch subscription is inactive. Read-only access only. Contact your administrator to add this branch to your subscription."
-        )
+        detail = "This branch subscription is inactive. Read-only access only. Contact your administrator to add this branch to your subscription."
+        _cache_decision(cache_key, 403, detail)
+        raise HTTPException(status_code=403, detail=detail)
 
     # Subscription is active
+    _cache_decision(cache_key, None, valid_for=subscription_end_date - now)
     return current_tenant
 
 
@@ -100,23 +155,16 @@ async def get_branch_subscription_status(
         bool: True if branch is paid/active, False if unpaid
     """
 
-    # Get tenant
-    tenant_result = await db.execute(
-        select(Tenant).where(Tenant.id == tenant_id)
-    )
-    tenant = tenant_result.scalar_one_or_none()
+    now = datetime.utcnow()
+
+    # Get tenant and its parent (identity map lookups, no query when already loaded)
+    tenant = await db.get(Tenant, tenant_id)
 
     if not tenant:
         return False
 
-    # Determine parent tenant ID
     parent_tenant_id = tenant.parent_tenant_id if tenant.parent_tenant_id else tenant.id
-
-    # Get parent tenant to check trial status
-    parent_result = await db.execute(
-        select(Tenant).where(Tenant.id == parent_tenant_id)
-    )
-    parent_tenant = parent_result.scalar_one_or_none()
+    parent_tenant = tenant if not tenant.parent_tenant_id else await db.get(Tenant, parent_tenant_id)
 
     if not parent_tenant:
         return False
@@ -127,18 +175,19 @@ async def get_branch_subscription_status(
 
     # If in trial period, consider as paid
     if parent_tenant.subscription_status == 'trial':
-        if parent_tenant.trial_ends_at and parent_tenant.trial_ends_at > datetime.utcnow():
+        if parent_tenant.trial_ends_at and parent_tenant.trial_ends_at > now:
             return True
 
     # Check active subscription
-    active_sub_result = await db.execute(
-        select(ActiveBranchSubscription).where(
-            ActiveBranchSubscription.parent_tenant_id == parent_tenant_id,
-            ActiveBranchSubscription.branch_tenant_id == tenant_id,
-            ActiveBranchSubscription.is_active == True,
-            ActiveBranchSubscription.subscription_end_date > datetime.utcnow()
+    is_paid = await db.scalar(
+        select(
+            exists().where(
+                ActiveBranchSubscription.parent_tenant_id == parent_tenant_id,
+                ActiveBranchSubscription.branch_tenant_id == tenant_id,
+                ActiveBranchSubscription.is_active == True,
+                ActiveBranchSubscription.subscription_end_date > now
+            )
         )
     )
-    active_sub = active_sub_result.scalar_one_or_none()
 
-    return active_sub is not None
+    return bool(is_paid)
@@ -14,7 +14,7 @@ import asyncio
 import logging
 from datetime import datetime, timedelta
 from typing import List, Dict
-from sqlalchemy import select, and_, or_
+from sqlalchemy import select, update, and_, or_, exists, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database import async_session_maker
@@ -23,11 +23,18 @@ from models import (
     ActiveBranchSubscription,
     User
 )
-from email_service import EmailService
+from email_service import email_service
+from subscription_middleware import invalidate_subscription_cache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Maximum number of notification emails in flight at once
+EMAIL_SEND_CONCURRENCY = 20
+
+# Tenants loaded per batch, keeping peak memory flat as the tenant base grows
+SCHEDULER_BATCH_SIZE = 500
+
 
 async def check_and_notify_expiring_subscriptions():
     """
@@ -37,37 +44,32 @@ async def check_and_notify_expiring_subscriptions():
     logger.info("🔍 Starting daily subscription expiry check...")
 
     async with async_session_maker() as db:
-        email_service = EmailService()
         now = datetime.utcnow()
 
         # Define notification windows (days before expiry)
         notification_windows = [7, 3, 1]
 
+        # Each window covers the whole calendar day `days_before` days from now
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        window_conditions = []
         for days_before in notification_windows:
-            target_date = now + timedelta(days=days_before)
-            # Check for subscriptions expiring on this target date (within a 1-hour window)
-            start_window = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
+            start_window = today + timedelta(days=days_before)
             end_window = start_window + timedelta(days=1)
-
-            logger.info(f"📅 Checking for subscriptions expiring in {days_before} day(s)...")
-
-            # Find tenants whose next_billing_date is within this window
-            result = await db.execute(
-                select(Tenant).where(
-                    and_(
-                        Tenant.next_billing_date >= start_window,
-                        Tenant.next_billing_date < end_window,
-                        Tenant.subscription_status == 'active',
-                        Tenant.owner_email.isnot(None)
-                    )
+            window_conditions.append(
+                and_(
+                    Tenant.next_billing_date >= start_window,
+                    Tenant.next_billing_date < end_window
                 )
             )
-            expiring_tenants = result.scalars().all()
 
-            for tenant in expiring_tenants:
+        logger.info(f"📅 Checking for subscriptions expiring in {', '.join(str(d) for d in notification_windows)} day(s)...")
+
+        semaphore = asyncio.Semaphore(EMAIL_SEND_CONCURRENCY)
+
+        async def _notify(tenant, unpaid_branches: List[Dict]):
+            async with semaphore:
                 try:
-                    # Get unpaid branches for this tenant
-                    unpaid_branches = await get_unpaid_branches(db, tenant.id)
+                    days_before = (tenant.next_billing_date.date() - today.date()).days
                     unpaid_branch_names = [b['name'] for b in unpaid_branches]
 
                     # Send expiring notification
@@ -88,6 +90,35 @@ async def check_and_notify_expiring_subscriptions():
                 except Exception as e:
                     logger.error(f"❌ Error sending notification for tenant {tenant.id}: {str(e)}")
 
+        # Stream tenants whose next_billing_date falls in any window (one query for all windows)
+        result = await db.stream(
+            select(
+                Tenant.id,
+                Tenant.name,
+                Tenant.subdomain,
+                Tenant.owner_email,
+                Tenant.next_billing_date
+            ).where(
+                and_(
+                    or_(*window_conditions),
+                    Tenant.subscription_status == 'active',
+                    Tenant.owner_email.isnot(None)
+                )
+            ).execution_options(yield_per=SCHEDULER_BATCH_SIZE)
+        )
+
+        async for expiring_tenants in result.partitions(SCHEDULER_BATCH_SIZE):
+            # Load unpaid branches for every tenant in this batch in one query
+            unpaid_by_parent = await get_unpaid_branches_for_tenants(
+                db, [tenant.id for tenant in expiring_tenants]
+            )
+
+            # Send the batch's notifications concurrently (bounded by the semaphore)
+            await asyncio.gather(
+                *[_notify(tenant, unpaid_by_parent.get(tenant.id, [])) for tenant in expiring_tenants],
+                return_exceptions=True
+            )
+
     logger.info("✅ Daily subscription expiry check completed")
 
 
@@ -103,90 +134,127 @@ async def check_and_deactivate_expired_subscriptions():
     logger.info("🔍 Starting expired subscription check...")
 
     async with async_session_maker() as db:
-        email_service = EmailService()
         now = datetime.utcnow()
 
         # Find tenants whose subscription expired recently (within last 24 hours)
         # This prevents sending multiple emails for the same expiration
         yesterday = now - timedelta(days=1)
 
-        result = await db.execute(
-            select(Tenant).where(
-                and_(
-                    Tenant.next_billing_date < now,
-                    Tenant.next_billing_date >= yesterday,
-                    Tenant.subscription_status == 'active',  # Still marked active, needs to be updated
-                    Tenant.owner_email.isnot(None)
-                )
-            )
-        )
-        expired_tenants = result.scalars().all()
-
-        logger.info(f"📊 Found {len(expired_tenants)} tenant(s) with recently expired subscriptions")
-
-        for tenant in expired_tenants:
-            try:
-                # Get all branches for this tenant
-                branches_result = await db.execute(
-                    select(Tenant).where(
-                        or_(
-                            Tenant.id == tenant.id,
-                            Tenant.parent_tenant_id == tenant.id
-                        )
+        semaphore = asyncio.Semaphore(EMAIL_SEND_CONCURRENCY)
+
+        async def _notify_expired(notification: Dict):
+            async with semaphore:
+                try:
+                    # Send expired notification
+                    success = await email_service.send_subscription_expired_notification(**notification)
+
+                    if success:
+                        logger.info(f"✅ Sent expired notification to {notification['admin_email']} for tenant '{notification['tenant_name']}'")
+
+                except Exception as e:
+                    logger.error(f"❌ Error sending expired notification to {notification['admin_email']}: {str(e)}")
+
+        processed_count = 0
+        last_tenant_id = 0
+
+        # Walk expired tenants in id-ordered batches. Keyset pagination (rather than
+        # a streamed cursor) lets each batch's changes be committed mid-scan.
+        while True:
+            result = await db.execute(
+                select(
+                    Tenant.id,
+                    Tenant.name,
+                    Tenant.subdomain,
+                    Tenant.owner_email,
+                    Tenant.next_billing_date
+                ).where(
+                    and_(
+                        Tenant.next_billing_date < now,
+                        Tenant.next_billing_date >= yesterday,
+                        Tenant.subscription_status == 'active',  # Still marked active, needs to be updated
+                        Tenant.owner_email.isnot(None),
+                        Tenant.id > last_tenant_id
                     )
-                )
-                all_branches = branches_result.scalars().all()
-                branch_names = [b.name for b in all_branches]
-
-                # Send expired notification
-                success = await email_service.send_subscription_expired_notification(
-                    tenant_name=tenant.name,
-                    tenant_subdomain=tenant.subdomain,
-                    admin_email=tenant.owner_email,
-                    expired_date=tenant.next_billing_date.strftime("%B %d, %Y"),
-                    affected_branches=branch_names
-                )
+                ).order_by(Tenant.id).limit(SCHEDULER_BATCH_SIZE)
+            )
+            expired_tenants = result.all()
 
-                if success:
-                    logger.info(f"✅ Sent expired notification to {tenant.owner_email} for tenant '{tenant.name}'")
+            if not expired_tenants:
+                break
 
-                # Update tenant subscription status to expired
-                tenant.subscription_status = 'expired'
+            last_tenant_id = expired_tenants[-1].id
+            processed_count += len(expired_tenants)
+            batch_ids = [tenant.id for tenant in expired_tenants]
 
-                # Deactivate all active branch subscriptions for this tenant
-                await db.execute(
-                    select(ActiveBranchSubscription).where(
-                        and_(
-                            ActiveBranchSubscription.parent_tenant_id == tenant.id,
-                            ActiveBranchSubscription.subscription_end_date < now,
-                            ActiveBranchSubscription.is_active == True
-                        )
-                    ).execution_options(synchronize_session=False)
-                )
+            # Expired notifications are queued here and sent concurrently after the batch's DB work
+            expired_notifications = []
+            expired_tenant_ids = []
 
-                # Mark all expired active branch subscriptions as inactive
-                branch_subs_result = await db.execute(
-                    select(ActiveBranchSubscription).where(
-                        and_(
-                            ActiveBranchSubscription.parent_tenant_id == tenant.id,
-                            ActiveBranchSubscription.subscription_end_date < now,
-                            ActiveBranchSubscription.is_active == True
-                        )
+            # Get all branch names for this batch in one query
+            branches_result = await db.execute(
+                select(func.coalesce(Tenant.parent_tenant_id, Tenant.id), Tenant.name).where(
+                    or_(
+                        Tenant.id.in_(batch_ids),
+                        Tenant.parent_tenant_id.in_(batch_ids)
                     )
                 )
-                expired_branch_subs = branch_subs_result.scalars().all()
+            )
+            branch_names_by_parent: Dict[int, List[str]] = {}
+            for parent_id, name in branches_result.all():
+                branch_names_by_parent.setdefault(parent_id, []).append(name)
 
-                for branch_sub in expired_branch_subs:
-                    branch_sub.is_active = False
-                    branch_sub.updated_at = now
+            for tenant in expired_tenants:
+                try:
+                    branch_names = branch_names_by_parent.get(tenant.id, [])
+
+                    # Queue expired notification
+                    expired_notifications.append({
+                        "tenant_name": tenant.name,
+                        "tenant_subdomain": tenant.subdomain,
+                        "admin_email": tenant.owner_email,
+                        "expired_date": tenant.next_billing_date.strftime("%B %d, %Y"),
+                        "affected_branches": branch_names
+                    })
+
+                    # Savepoint per tenant: a failure rolls back only this tenant's changes
+                    async with db.begin_nested():
+                        # Update tenant subscription status to expired
+                        await db.execute(
+                            update(Tenant)
+                            .where(Tenant.id == tenant.id)
+                            .values(subscription_status='expired')
+                            .execution_options(synchronize_session=False)
+                        )
+
+                        # Mark all expired active branch subscriptions as inactive in one UPDATE
+                        deactivate_result = await db.execute(
+                            update(ActiveBranchSubscription).where(
+                                and_(
+                                    ActiveBranchSubscription.parent_tenant_id == tenant.id,
+                                    ActiveBranchSubscription.subscription_end_date < now,
+                                    ActiveBranchSubscription.is_active == True
+                                )
+                            ).values(
+                                is_active=False,
+                                updated_at=now
+                            ).execution_options(synchronize_session=False)
+                        )
+
+                    logger.info(f"🔒 Deactivated {deactivate_result.rowcount} branch subscription(s) for tenant '{tenant.name}'")
+                    expired_tenant_ids.append(tenant.id)
 
-                logger.info(f"🔒 Deactivated {len(expired_branch_subs)} branch subscription(s) for tenant '{tenant.name}'")
+                except Exception as e:
+                    logger.error(f"❌ Error processing expired tenant {tenant.id}: {str(e)}")
+
+            # One commit for the whole batch instead of one per tenant
+            await db.commit()
+            for tenant_id in expired_tenant_ids:
+                invalidate_subscription_cache(tenant_id)
 
-                await db.commit()
+            # Send the batch's notifications concurrently (bounded by the semaphore)
+            await asyncio.gather(*[_notify_expired(n) for n in expired_notifications], return_exceptions=True)
 
-            except Exception as e:
-                logger.error(f"❌ Error processing expired tenant {tenant.id}: {str(e)}")
-                await db.rollback()
+        logger.info(f"📊 Processed {processed_count} tenant(s) with recently expired subscriptions")
 
     logger.info("✅ Expired subscription check completed")
 
@@ -204,38 +272,70 @@ async def get_unpaid_branches(db: AsyncSession, parent_tenant_id: int) -> List[D
     """
     now = datetime.utcnow()
 
-    # Get all branches for this tenant
-    all_branches_result = await db.execute(
-        select(Tenant).where(
+    # Branches with no active (paid) subscription, filtered in a single anti-join
+    result = await db.execute(
+        select(Tenant.id, Tenant.name).where(
             or_(
                 Tenant.id == parent_tenant_id,
                 Tenant.parent_tenant_id == parent_tenant_id
+            ),
+            ~exists().where(
+                and_(
+                    ActiveBranchSubscription.parent_tenant_id == parent_tenant_id,
+                    ActiveBranchSubscription.branch_tenant_id == Tenant.id,
+                    ActiveBranchSubscription.is_active == True,
+                    ActiveBranchSubscription.subscription_end_date > now
+                )
             )
         )
     )
-    all_branches = all_branches_result.scalars().all()
-
-    # Get active (paid) branch subscriptions
-    active_subs_result = await db.execute(
-        select(ActiveBranchSubscription).where(
-            and_(
-                ActiveBranchSubscription.parent_tenant_id == parent_tenant_id,
-                ActiveBranchSubscription.is_active == True,
-                ActiveBranchSubscription.subscription_end_date > now
+
+    return [{"id": branch_id, "name": name} for branch_id, name in result.all()]
+
+
+async def get_unpaid_branches_for_tenants(
+    db: AsyncSession,
+    parent_tenant_ids: List[int]
+) -> Dict[int, List[Dict]]:
+    """
+    Bulk version of get_unpaid_branches for many tenants at once.
+
+    Args:
+        db: Database session
+        parent_tenant_ids: IDs of the parent tenants
+
+    Returns:
+        Dict mapping parent tenant ID to its unpaid branches
+    """
+    if not parent_tenant_ids:
+        return {}
+
+    now = datetime.utcnow()
+    owner_id = func.coalesce(Tenant.parent_tenant_id, Tenant.id)
+
+    # Branches with no active (paid) subscription from their parent, in a single anti-join
+    result = await db.execute(
+        select(Tenant.id, Tenant.name, owner_id).where(
+            or_(
+                Tenant.id.in_(parent_tenant_ids),
+                Tenant.parent_tenant_id.in_(parent_tenant_ids)
+            ),
+            ~exists().where(
+                and_(
+                    ActiveBranchSubscription.parent_tenant_id == owner_id,
+                    ActiveBranchSubscription.branch_tenant_id == Tenant.id,
+                    ActiveBranchSubscription.is_active == True,
+                    ActiveBranchSubscription.subscription_end_date > now
+                )
             )
         )
     )
-    active_subs = active_subs_result.scalars().all()
-    paid_branch_ids = {sub.branch_tenant_id for sub in active_subs}
 
-    # Find unpaid branches (branches not in paid list)
-    unpaid_branches = [
-        {"id": branch.id, "name": branch.name}
-        for branch in all_branches
-        if branch.id not in paid_branch_ids
-    ]
+    unpaid_by_parent: Dict[int, List[Dict]] = {}
+    for branch_id, name, parent_id in result.all():
+        unpaid_by_parent.setdefault(parent_id, []).append({"id": branch_id, "name": name})
 
-    return unpaid_branches
+    return unpaid_by_parent
 
 
 async def run_daily_subscription_checks():
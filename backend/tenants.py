@@ -4,65 +4,78 @@ Handles tenant registration, settings, and user management within tenants
 """
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, insert, update, delete, func
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, insert, update, delete, func, exists, literal, null, or_
+from sqlalchemy.orm import selectinload, aliased
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, date, timedelta
-from typing import List
-import asyncio
+from typing import Dict, List, Tuple
+import logging
+import re
+import secrets
+import time
 
-from database import get_db
+from database import get_db, engine
 from models import Tenant, User, tenant_users, Product, Sale, UserRole, StockMovement, BranchStock
 from schemas import (
     TenantCreate, TenantResponse, TenantUpdate, TenantSummary,
     UserInvite, UserAdd, UserResponse, UserTenantInfo, TenantUsageStats, UserTenantUpdate,
     UserWithRoleResponse, ConvertToOrganizationRequest,
-    BranchResponse, BranchCreate, BranchUpdate
+    BranchResponse, BranchCreate, BranchUpdate,
+    LogoUploadRequest, LogoUploadURL, LogoUploadConfirm, SubdomainAvailabilityRequest
+)
+from image_utils import (
+    process_and_upload_logo, delete_many_from_r2,
+    create_logo_upload_url, verify_uploaded_logo, finalize_uploaded_logo
 )
-from image_utils import process_and_upload_logo, delete_from_r2
 from auth import (
-    get_password_hash, get_current_active_user, get_current_tenant,
-    require_admin_role, get_tenant_from_subdomain
+    get_password_hash_async, get_current_active_user, get_current_tenant,
+    require_admin_role, get_tenant_id_from_subdomain, invalidate_subdomain_cache
 )
-from email_service import EmailService
+from email_service import email_service
 from config import settings
 
+logger = logging.getLogger(__name__)
+
+# Branch subdomain clean-up (compiled once)
+_SUBDOMAIN_STRIP = re.compile(r'[^a-z0-9-]')
+_SUBDOMAIN_COLLAPSE = re.compile(r'-+')
+
 router = APIRouter(prefix="/tenants", tags=["tenants"])
 
 
 @router.post("/register", response_model=TenantResponse, status_code=status.HTTP_201_CREATED)
 async def register_tenant(
     tenant_data: TenantCreate,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db)
 ):
     """
     PUBLIC ENDPOINT: Register a new tenant/organization.
     Creates the tenant and the initial admin user.
     """
-    # Check subdomain availability
+    # Check subdomain, slug and admin username availability in one round trip
     result = await db.execute(
-        select(Tenant).where(Tenant.subdomain == tenant_data.subdomain)
+        select(
+            exists().where(Tenant.subdomain == tenant_data.subdomain),
+            exists().where(Tenant.slug == tenant_data.slug),
+            exists().where(User.username == tenant_data.admin_username)
+        )
     )
-    if result.scalar_one_or_none():
+    subdomain_taken, slug_taken, username_taken = result.one()
+
+    if subdomain_taken:
         raise HTTPException(
             status_code=400,
             detail="Subdomain already taken"
         )
     
-    # Check slug availability
-    result = await db.execute(
-        select(Tenant).where(Tenant.slug == tenant_data.slug)
-    )
-    if result.scalar_one_or_none():
+    if slug_taken:
         raise HTTPException(
             status_code=400,
             detail="Slug already taken"
         )
     
-    # Check if admin username exists
-    result = await db.execute(
-        select(User).where(User.username == tenant_data.admin_username)
-    )
-    if result.scalar_one_or_none():
+    if username_taken:
         raise HTTPException(
             status_code=400,
             detail="Username already taken"
@@ -89,7 +102,7 @@ async def register_tenant(
     admin_user = User(
         username=tenant_data.admin_username,
         email=tenant_data.owner_email,
-        hashed_password=get_password_hash(tenant_data.admin_password),
+        hashed_password=await get_password_hash_async(tenant_data.admin_password),
         full_name=tenant_data.admin_full_name,
         is_active=True
     )
@@ -107,22 +120,18 @@ async def register_tenant(
     )
     
     await db.commit()
-    await db.refresh(new_tenant)
+    invalidate_subdomain_cache(new_tenant.subdomain)
 
-    # Send welcome email to new business owner (fire and forget - non-blocking)
+    # Send welcome email to new business owner after the response is sent
     if settings.POSTMARK_ENABLED:
-        email_service = EmailService()
-
-        # Use asyncio.create_task for fire-and-forget execution
-        asyncio.create_task(
-            email_service.send_welcome_email(
-                user_email=tenant_data.owner_email,
-                user_full_name=tenant_data.admin_full_name,
-                business_name=tenant_data.name,
-                subdomain=tenant_data.subdomain
-            )
+        background_tasks.add_task(
+            email_service.send_welcome_email,
+            user_email=tenant_data.owner_email,
+            user_full_name=tenant_data.admin_full_name,
+            business_name=tenant_data.name,
+            subdomain=tenant_data.subdomain
         )
-        print(f"Queued welcome email to {tenant_data.owner_email} for business: {tenant_data.name}")
+        logger.info("📧 Queued welcome email to %s for business: %s", tenant_data.owner_email, tenant_data.name)
 
     return new_tenant
 
@@ -147,10 +156,7 @@ async def update_current_tenant(
     for key, value in updates.model_dump(exclude_unset=True).items():
         setattr(current_tenant, key, value)
     
-    current_tenant.updated_at = datetime.utcnow()
-    
     await db.commit()
-    await db.refresh(current_tenant)
 
     return current_tenant
 
@@ -178,41 +184,86 @@ async def upload_tenant_logo(
 
     # Update tenant record
     current_tenant.logo_url = logo_url
-    current_tenant.updated_at = datetime.utcnow()
 
     await db.commit()
-    await db.refresh(current_tenant)
 
     return current_tenant
 
 
+@router.post("/me/logo/presign", response_model=LogoUploadURL)
+async def presign_tenant_logo_upload(
+    request: LogoUploadRequest,
+    current_tenant: Tenant = Depends(get_current_tenant),
+    _: bool = Depends(require_admin_role)
+):
+    """
+    Get a presigned R2 URL for uploading the business logo directly (admin only).
+
+    The client PUTs the file to the returned URL with the same Content-Type,
+    then calls POST /me/logo/confirm with the key.
+    """
+    return await create_logo_upload_url(current_tenant.id, request.content_type)
+
+
+@router.post("/me/logo/confirm", response_model=TenantResponse)
+async def confirm_tenant_logo_upload(
+    request: LogoUploadConfirm,
+    background_tasks: BackgroundTasks,
+    current_tenant: Tenant = Depends(get_current_tenant),
+    _: bool = Depends(require_admin_role),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Record a logo uploaded directly to R2 (admin only).
+
+    The upload is decoded and re-encoded (with its display variant) before the
+    tenant is updated; the previous logo is removed in the background.
+    """
+    await verify_uploaded_logo(current_tenant.id, request.key)
+    await finalize_uploaded_logo(request.key)
+
+    # Don't clean up the key being confirmed if the client retries
+    old_logo_url = current_tenant.logo_url if current_tenant.logo_url != request.key else None
+
+    # Update tenant record
+    current_tenant.logo_url = request.key
+
+    await db.commit()
+
+    if old_logo_url:
+        # R2 cleanup isn't user-visible, so it runs after the response is sent
+        old_base = old_logo_url.replace('.jpg', '').replace('.png', '').replace('.jpeg', '')
+        background_tasks.add_task(_delete_logo_variants, old_base, '.jpg')
+
+    return current_tenant
+
+
+async def _delete_logo_variants(base_path: str, ext: str):
+    """Delete both logo variants from R2 (runs as a background task)"""
+    await delete_many_from_r2([
+        f"{base_path}{ext}",  # Original
+        f"{base_path}_display{ext}"  # Display variant
+    ])
+
+
 @router.delete("/me/logo", response_model=TenantResponse)
 async def delete_tenant_logo(
+    background_tasks: BackgroundTasks,
     current_tenant: Tenant = Depends(get_current_tenant),
     _: bool = Depends(require_admin_role),
     db: AsyncSession = Depends(get_db)
 ):
     """Delete business logo from R2 (admin only)"""
     if current_tenant.logo_url:
-        # Delete both variants from R2
-        try:
-            base_path = current_tenant.logo_url.replace('.jpg', '').replace('.png', '')
-            ext = '.jpg'  # We always save as .jpg
-
-            delete_tasks = [
-                delete_from_r2(f"{base_path}{ext}"),  # Original
-                delete_from_r2(f"{base_path}_display{ext}")  # Display variant
-            ]
-            await asyncio.gather(*delete_tasks, return_exceptions=True)
-        except Exception as e:
-            print(f"Warning: Failed to delete logo from R2: {e}")
+        # R2 cleanup isn't user-visible, so it runs after the response is sent
+        base_path = current_tenant.logo_url.replace('.jpg', '').replace('.png', '')
+        ext = '.jpg'  # We always save as .jpg
+        background_tasks.add_task(_delete_logo_variants, base_path, ext)
 
     # Update tenant record
     current_tenant.logo_url = None
-    current_tenant.updated_at = datetime.utcnow()
 
     await db.commit()
-    await db.refresh(current_tenant)
 
     return current_tenant
 
@@ -223,51 +274,40 @@ async def list_tenant_users(
     db: AsyncSession = Depends(get_db)
 ):
     """List all users in current tenant with their roles and branch assignments"""
+    # One joined SELECT over tenant_users: role, status and branch live on the
+    # association row, which selectinload(Tenant.users) cannot expose
+    branch = aliased(Tenant)
     result = await db.execute(
         select(
-            User,
+            User.id,
+            User.username,
+            User.email,
+            User.full_name,
+            User.is_active,
+            User.created_at,
             tenant_users.c.role,
-            tenant_users.c.is_active,
+            tenant_users.c.is_active.label('tenant_is_active'),
             tenant_users.c.joined_at,
             tenant_users.c.branch_id,
-            Tenant.name.label('branch_name')
+            branch.name.label('branch_name')
         )
         .join(tenant_users, User.id == tenant_users.c.user_id)
-        .outerjoin(Tenant, Tenant.id == tenant_users.c.branch_id)
+        .outerjoin(branch, branch.id == tenant_users.c.branch_id)
         .where(tenant_users.c.tenant_id == current_tenant.id)
         .order_by(tenant_users.c.joined_at)
     )
 
-    users_with_roles = []
-    for row in result:
-        user = row[0]
-        role = row[1]
-        
-        # Compute role_type for each user
-        role_type = "staff"  # Default
-        if role == UserRole.ADMIN:
-            if current_tenant.parent_tenant_id is None:
-                role_type = "parent_org_admin"
-            else:
-                role_type = "branch_admin"
-        
-        user_dict = {
-            "id": user.id,
-            "username": user.username,
-            "email": user.email,
-            "full_name": user.full_name,
-            "is_active": user.is_active,
-            "created_at": user.created_at,
-            "role": role,
-            "role_type": role_type,
-            "tenant_is_active": row[2],
-            "joined_at": row[3],
-            "branch_id": row[4],
-            "branch_name": row[5]
-        }
-        users_with_roles.append(user_dict)
+    # Admins are parent-org or branch admins depending on the current tenant
+    admin_role_type = "parent_org_admin" if current_tenant.parent_tenant_id is None else "branch_admin"
 
-    return users_with_roles
+    # Rows come straight from typed columns, so skip per-row validation
+    return [
+        UserWithRoleResponse.model_construct(
+            **row._mapping,
+            role_type=admin_role_type if row.role == UserRole.ADMIN else "staff"
+        )
+        for row in result
+    ]
 
 
 @router.post("/me/users", response_model=UserResponse)
@@ -305,7 +345,7 @@ async def add_user_to_tenant(
             )
 
         # User exists but not in this tenant - update password and add to tenant
-        existing_user.hashed_password = get_password_hash(user_data.password)
+        existing_user.hashed_password = await get_password_hash_async(user_data.password)
         existing_user.full_name = user_data.full_name
         user = existing_user
     else:
@@ -314,7 +354,7 @@ async def add_user_to_tenant(
         user = User(
             username=user_data.email.split('@')[0],
             email=user_data.email,
-            hashed_password=get_password_hash(user_data.password),
+            hashed_password=await get_password_hash_async(user_data.password),
             full_name=user_data.full_name,
             is_active=True
         )
@@ -336,7 +376,7 @@ async def add_user_to_tenant(
     )
 
     await db.commit()
-    await db.refresh(user)
+    invalidate_usage_cache(current_tenant.id)
 
     return user
 
@@ -369,11 +409,11 @@ async def invite_user_to_tenant(
     if not user:
         # Create new user with temporary password
         is_new_user = True
-        temp_password = f"temp{datetime.utcnow().timestamp()}"
+        temp_password = secrets.token_urlsafe(18)
         user = User(
             username=invite_data.email.split('@')[0],  # Use email prefix as username
             email=invite_data.email,
-            hashed_password=get_password_hash(temp_password),
+            hashed_password=await get_password_hash_async(temp_password),
             full_name=invite_data.full_name,
             is_active=True
         )
@@ -408,15 +448,14 @@ async def invite_user_to_tenant(
             is_active=True
         )
     )
+    invalidate_usage_cache(current_tenant.id)
 
     # Send invitation email (only if new user with temp password)
     if is_new_user and temp_password and settings.POSTMARK_ENABLED:
-        email_service = EmailService()
-
         # In test mode, send email synchronously to see output immediately
         # In production mode, use background task to avoid blocking the response
         if settings.EMAIL_TEST_MODE:
-            print(f"DEBUG: Sending test email synchronously to {user.email}")
+            logger.debug("Sending test email synchronously to %s", user.email)
             await email_service.send_invitation_email(
                 user_email=user.email,
                 user_full_name=user.full_name,
@@ -440,7 +479,6 @@ async def invite_user_to_tenant(
             )
 
     await db.commit()
-    await db.refresh(user)
 
     return user
 
@@ -462,47 +500,58 @@ async def update_user_in_tenant(
             detail="Cannot modify your own role or status"
         )
 
-    # Check if user exists in tenant
-    result = await db.execute(
-        select(tenant_users).where(
-            tenant_users.c.tenant_id == current_tenant.id,
-            tenant_users.c.user_id == user_id
-        )
-    )
-    membership = result.first()
-
-    if not membership:
-        raise HTTPException(
-            status_code=404,
-            detail="User not found in this tenant"
+    # Validate branch exists and belongs to current tenant
+    if updates.branch_id is not None and updates.branch_id > 0:
+        branch_exists = await db.scalar(
+            select(exists().where(
+                Tenant.id == updates.branch_id,
+                Tenant.parent_tenant_id == current_tenant.id
+            ))
         )
+        if not branch_exists:
+            raise HTTPException(
+                status_code=400,
+                detail="Branch not found or does not belong to this tenant"
+            )
 
-    # Get the user record for updating name/email
-    result = await db.execute(
-        select(User).where(User.id == user_id)
+    is_member = exists().where(
+        tenant_users.c.tenant_id == current_tenant.id,
+        tenant_users.c.user_id == user_id
     )
-    user = result.scalar_one()
 
-    # Update user's full_name if provided
+    # Update name/email and load the user in one statement; membership is
+    # checked in the WHERE clause and email uniqueness by the DB constraint
+    user_values = {}
     if updates.full_name is not None:
-        user.full_name = updates.full_name
+        user_values["full_name"] = updates.full_name
+    if updates.email is not None:
+        user_values["email"] = updates.email
+
+    if user_values:
+        user_stmt = (
+            update(User)
+            .where(User.id == user_id, is_member)
+            .values(**user_values)
+            .returning(User)
+            .execution_options(populate_existing=True)
+        )
+    else:
+        user_stmt = select(User).where(User.id == user_id, is_member)
 
-    # Update user's email if provided (with uniqueness check)
-    if updates.email is not None and updates.email != user.email:
-        # Check if email is already in use by another user
-        result = await db.execute(
-            select(User).where(
-                User.email == updates.email,
-                User.id != user_id
-            )
+    try:
+        user = (await db.execute(user_stmt)).scalar_one_or_none()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail="Email is already in use by another user"
+        )
+
+    if not user:
+        raise HTTPException(
+            status_code=404,
+            detail="User not found in this tenant"
         )
-        existing_user = result.scalar_one_or_none()
-        if existing_user:
-            raise HTTPException(
-                status_code=400,
-                detail="Email is already in use by another user"
-            )
-        user.email = updates.email
 
     # Build update dict for tenant_users table
     update_values = {}
@@ -511,20 +560,6 @@ async def update_user_in_tenant(
     if updates.is_active is not None:
         update_values["is_active"] = updates.is_active
     if updates.branch_id is not None:
-        # Validate branch exists and belongs to current tenant
-        if updates.branch_id > 0:
-            result = await db.execute(
-                select(Tenant).where(
-                    Tenant.id == updates.branch_id,
-                    Tenant.parent_tenant_id == current_tenant.id
-                )
-            )
-            branch = result.scalar_one_or_none()
-            if not branch:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Branch not found or does not belong to this tenant"
-                )
         update_values["branch_id"] = updates.branch_id if updates.branch_id > 0 else None
 
     if update_values:
@@ -538,7 +573,7 @@ async def update_user_in_tenant(
         )
 
     await db.commit()
-    await db.refresh(user)
+    invalidate_usage_cache(current_tenant.id)
 
     return user
 
@@ -568,22 +603,43 @@ async def reset_user_password(
             detail="User not found in this tenant"
         )
 
-    # Get user
-    result = await db.execute(
-        select(User).where(User.id == user_id)
-    )
-    user = result.scalar_one_or_none()
+    # Get user (identity map first, SELECT only on a miss)
+    user = await db.get(User, user_id)
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     # Update password
-    user.hashed_password = get_password_hash(new_password)
+    user.hashed_password = await get_password_hash_async(new_password)
     await db.commit()
 
     return {"message": f"Password reset successfully for {user.email}"}
 
 
+async def _user_data_counts(db: AsyncSession, tenant_id: int, user_id: int):
+    """Count a user's sales and stock movements in a tenant with a single query"""
+    result = await db.execute(
+        select(
+            select(func.count(Sale.id))
+            .where(
+                Sale.tenant_id == tenant_id,
+                Sale.user_id == user_id
+            )
+            .scalar_subquery(),
+            select(func.count(StockMovement.id))
+            .select_from(StockMovement)
+            .join(Product, StockMovement.product_id == Product.id)
+            .where(
+                Product.tenant_id == tenant_id,
+                StockMovement.user_id == user_id
+            )
+            .scalar_subquery()
+        )
+    )
+    sales_count, stock_movements_count = result.one()
+    return sales_count or 0, stock_movements_count or 0
+
+
 @router.get("/me/users/{user_id}/can-delete")
 async def check_user_can_delete(
     user_id: int,
@@ -615,27 +671,8 @@ async def check_user_can_delete(
     if not membership:
         raise HTTPException(404, detail="User not found in this tenant")
 
-    # Check if user has any data in this tenant
-    # Check for sales created by this user
-    sales_result = await db.execute(
-        select(func.count(Sale.id)).where(
-            Sale.tenant_id == current_tenant.id,
-            Sale.user_id == user_id
-        )
-    )
-    sales_count = sales_result.scalar() or 0
-
-    # Check for stock movements by this user
-    stock_movements_result = await db.execute(
-        select(func.count(StockMovement.id))
-        .select_from(StockMovement)
-        .join(Product, StockMovement.product_id == Product.id)
-        .where(
-            Product.tenant_id == current_tenant.id,
-            StockMovement.user_id == user_id
-        )
-    )
-    stock_movements_count = stock_movements_result.scalar() or 0
+    # Check if user has any data in this tenant (sales and stock movements)
+    sales_count, stock_movements_count = await _user_data_counts(db, current_tenant.id, user_id)
 
     has_data = sales_count > 0 or stock_movements_count > 0
 
@@ -671,33 +708,13 @@ async def remove_user_from_tenant(
         )
 
     # Get user info for response message
-    user_result = await db.execute(
-        select(User).where(User.id == user_id)
-    )
-    user = user_result.scalar_one_or_none()
+    user = await db.get(User, user_id)
 
     if not user:
         raise HTTPException(404, detail="User not found")
 
-    # Check if user has any data in this tenant
-    sales_result = await db.execute(
-        select(func.count(Sale.id)).where(
-            Sale.tenant_id == current_tenant.id,
-            Sale.user_id == user_id
-        )
-    )
-    sales_count = sales_result.scalar() or 0
-
-    stock_movements_result = await db.execute(
-        select(func.count(StockMovement.id))
-        .select_from(StockMovement)
-        .join(Product, StockMovement.product_id == Product.id)
-        .where(
-            Product.tenant_id == current_tenant.id,
-            StockMovement.user_id == user_id
-        )
-    )
-    stock_movements_count = stock_movements_result.scalar() or 0
+    # Check if user has any data in this tenant (sales and stock movements)
+    sales_count, stock_movements_count = await _user_data_counts(db, current_tenant.id, user_id)
 
     has_data = sales_count > 0 or stock_movements_count > 0
 
@@ -712,6 +729,7 @@ async def remove_user_from_tenant(
             .values(is_active=False)
         )
         await db.commit()
+        invalidate_usage_cache(current_tenant.id)
 
         return {
             "message": f"User '{user.full_name}' has been deactivated. Historical data preserved.",
@@ -731,6 +749,7 @@ async def remove_user_from_tenant(
             )
         )
         await db.commit()
+        invalidate_usage_cache(current_tenant.id)
 
         return {
             "message": f"User '{user.full_name}' removed from tenant",
@@ -739,44 +758,61 @@ async def remove_user_from_tenant(
         }
 
 
+# ==================== USAGE CACHE ====================
+# /me/usage is polled on most page loads. Counts are cached per process for
+# a short TTL, so any figure may lag by up to the TTL. The membership
+# endpoints here and product creation call invalidate_usage_cache() so the
+# limits a user just hit show straight away; other product changes (and
+# changes made on another worker) rely on the TTL.
+USAGE_CACHE_TTL_SECONDS = 60
+_usage_cache: Dict[int, Tuple[float, Tuple[int, int, int, float]]] = {}
+
+
+def invalidate_usage_cache(tenant_id: int) -> None:
+    """Drop a tenant's cached usage counts"""
+    _usage_cache.pop(tenant_id, None)
+
+
 @router.get("/me/usage", response_model=TenantUsageStats)
 async def get_tenant_usage_stats(
     current_tenant: Tenant = Depends(get_current_tenant),
     db: AsyncSession = Depends(get_db)
 ):
     """Get current usage statistics for subscription management"""
-    # Count active users
-    result = await db.execute(
-        select(func.count(tenant_users.c.user_id)).where(
-            tenant_users.c.tenant_id == current_tenant.id,
-            tenant_users.c.is_active == True
+    cached = _usage_cache.get(current_tenant.id)
+    if cached and cached[0] > time.monotonic():
+        current_users, current_products, sales_count, revenue = cached[1]
+    else:
+        start_of_month = datetime.combine(date.today().replace(day=1), datetime.min.time())
+
+        # Active users, products and this month's sales in a single round trip
+        sales_this_month = (
+            Sale.tenant_id == current_tenant.id,
+            Sale.created_at >= start_of_month
         )
-    )
-    current_users = result.scalar() or 0
-    
-    # Count products
-    result = await db.execute(
-        select(func.count(Product.id)).where(
-            Product.tenant_id == current_tenant.id
+        result = await db.execute(
+            select(
+                select(func.count(tenant_users.c.user_id)).where(
+                    tenant_users.c.tenant_id == current_tenant.id,
+                    tenant_users.c.is_active == True
+                ).scalar_subquery(),
+                select(func.count(Product.id)).where(
+                    Product.tenant_id == current_tenant.id
+                ).scalar_subquery(),
+                select(func.count(Sale.id)).where(*sales_this_month).scalar_subquery(),
+                select(func.sum(Sale.total)).where(*sales_this_month).scalar_subquery()
+            )
         )
-    )
-    current_products = result.scalar() or 0
-    
-    # This month's sales
-    start_of_month = date.today().replace(day=1)
-    result = await db.execute(
-        select(
-            func.count(Sale.id),
-            func.sum(Sale.total)
-        ).where(
-            Sale.tenant_id == current_tenant.id,
-            func.date(Sale.created_at) >= start_of_month
+        row = result.one()
+        current_users = row[0] or 0
+        current_products = row[1] or 0
+        sales_count = row[2] or 0
+        revenue = float(row[3] or 0)
+        _usage_cache[current_tenant.id] = (
+            time.monotonic() + USAGE_CACHE_TTL_SECONDS,
+            (current_users, current_products, sales_count, revenue)
         )
-    )
-    row = result.first()
-    sales_count = row[0] or 0
-    revenue = float(row[1] or 0)
-    
+
     return {
         "current_users": current_users,
         "max_users": current_tenant.max_users,
@@ -805,26 +841,16 @@ async def delete_tenant(
     tenant_id = current_tenant.id
     tenant_name = current_tenant.name
 
-    # Get all users belonging to this tenant
+    # Find members of this tenant who belong to no other tenant - their user
+    # accounts are deleted too (one grouped query instead of a count per user)
+    member_ids = select(tenant_users.c.user_id).where(tenant_users.c.tenant_id == tenant_id)
     result = await db.execute(
         select(tenant_users.c.user_id)
-        .where(tenant_users.c.tenant_id == tenant_id)
+        .where(tenant_users.c.user_id.in_(member_ids))
+        .group_by(tenant_users.c.user_id)
+        .having(func.count(tenant_users.c.tenant_id) == 1)
     )
-    user_ids = [row[0] for row in result.all()]
-
-    # Check each user - if they only belong to this tenant, delete the user account
-    users_to_delete = []
-    for user_id in user_ids:
-        # Count how many tenants this user belongs to
-        result = await db.execute(
-            select(func.count(tenant_users.c.tenant_id))
-            .where(tenant_users.c.user_id == user_id)
-        )
-        tenant_count = result.scalar()
-
-        # If user only belongs to this tenant, mark for deletion
-        if tenant_count == 1:
-            users_to_delete.append(user_id)
+    users_to_delete = [row[0] for row in result.all()]
 
     # Delete the tenant (cascade will handle related data like products, sales, etc.)
     await db.execute(
@@ -838,6 +864,7 @@ async def delete_tenant(
         )
 
     await db.commit()
+    invalidate_subdomain_cache(current_tenant.subdomain)
 
     return {
         "message": f"Business '{tenant_name}' has been permanently deleted",
@@ -846,6 +873,44 @@ async def delete_tenant(
     }
 
 
+# Catalogs at least this large are copied with PostgreSQL COPY during conversion
+CONVERT_COPY_THRESHOLD = 1000
+
+
+async def _insert_returning_ids(db: AsyncSession, model, rows: List[dict]) -> List[int]:
+    """
+    Bulk-insert rows and return their new IDs in the same order.
+
+    Small batches use one executemany INSERT ... RETURNING. Large batches on
+    PostgreSQL pre-allocate IDs from the table's sequence and stream the rows
+    with asyncpg's COPY, which skips per-row statement overhead.
+    """
+    if len(rows) < CONVERT_COPY_THRESHOLD or engine.dialect.name != "postgresql":
+        result = await db.scalars(
+            insert(model).returning(model.id, sort_by_parameter_order=True),
+            rows
+        )
+        return result.all()
+
+    table = model.__table__
+    ids = (await db.scalars(
+        select(func.nextval(func.pg_get_serial_sequence(table.name, "id")))
+        .select_from(func.generate_series(1, len(rows)))
+    )).all()
+
+    # COPY bypasses Python-side column defaults, so set the timestamps here
+    now = datetime.utcnow()
+    columns = ["id", *rows[0].keys(), "created_at", "updated_at"]
+    records = [(new_id, *row.values(), now, now) for new_id, row in zip(ids, rows)]
+
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        table.name, records=records, columns=columns
+    )
+    return ids
+
+
 @router.post("/me/convert-to-organization")
 async def convert_tenant_to_organization(
     conversion_data: ConvertToOrganizationRequest,
@@ -859,15 +924,18 @@ async def convert_tenant_to_organization(
 
     This process:
     1. Creates an organization record
-    2. Migrates existing products → organization_products
-    3. Migrates existing categories → organization_categories
-    4. Creates branch_stock records for the current tenant
-    5. Converts the tenant into the first branch
-    6. Adds the current user as org_admin
+    2. Copies the global categories the tenant's products use → organization_categories
+    3. Copies existing products → organization_products
+    4. Converts the tenant into the first branch
+    5. Adds the current user as org_admin
+
+    The tenant's own products are kept: sale items and branch stock reference
+    them, and its stock stays on them. Categories are global (shared by every
+    tenant), so they are copied, never deleted.
 
     WARNING: This is a one-way conversion. The tenant will become a branch.
     """
-    from models import Organization, OrganizationCategory, OrganizationProduct, BranchStock, Category, organization_users, OrgRole
+    from models import Organization, OrganizationCategory, OrganizationProduct, Category, organization_users, OrgRole
     from schemas import ConvertToOrganizationResponse, OrganizationResponse, BranchResponse
 
     # Verify tenant is independent (not already part of an organization)
@@ -901,87 +969,91 @@ async def convert_tenant_to_organization(
         )
     )
 
-    # Migrate categories
+    # Copy the (global) categories this tenant's products are filed under
     result = await db.execute(
-        select(Category).where(Category.tenant_id == current_tenant.id)
+        select(Category).where(
+            Category.id.in_(
+                select(Product.category_id).where(
+                    Product.tenant_id == current_tenant.id,
+                    Product.category_id.isnot(None)
+                )
+            )
+        )
     )
     old_categories = result.scalars().all()
     category_mapping = {}  # old_id -> new_id
 
-    for old_cat in old_categories:
-        new_cat = OrganizationCategory(
-            organization_id=new_org.id,
-            name=old_cat.name,
-            display_order=old_cat.display_order,
-            icon=old_cat.icon,
-            color=old_cat.color,
-            is_active=old_cat.is_active,
-            target_margin=old_cat.target_margin,
-            minimum_margin=old_cat.minimum_margin
-        )
-        db.add(new_cat)
-        await db.flush()
-        category_mapping[old_cat.id] = new_cat.id
-
-    # Migrate products
-    result = await db.execute(
-        select(Product).where(Product.tenant_id == current_tenant.id)
-    )
-    old_products = result.scalars().all()
-    migrated_product_count = 0
-
-    for old_prod in old_products:
-        # Map category ID if exists
-        new_category_id = None
-        if old_prod.category_id and old_prod.category_id in category_mapping:
-            new_category_id = category_mapping[old_prod.category_id]
-
-        # Create organization product
-        new_prod = OrganizationProduct(
-            organization_id=new_org.id,
-            name=old_prod.name,
-            sku=old_prod.sku,
-            description=old_prod.description,
-            base_cost=old_prod.base_cost,
-            selling_price=old_prod.selling_price,
-            target_margin=old_prod.target_margin,
-            minimum_margin=old_prod.minimum_margin,
-            category_id=new_category_id,
-            unit=old_prod.unit,
-            image_url=old_prod.image_url,
-            reorder_level=old_prod.reorder_level,
-            is_available=old_prod.is_available,
-            is_service=old_prod.is_service
+    # Insert all categories in one round trip, keeping their order
+    if old_categories:
+        new_category_ids = await _insert_returning_ids(
+            db,
+            OrganizationCategory,
+            [
+                {
+                    "organization_id": new_org.id,
+                    "name": old_cat.name,
+                    "display_order": old_cat.display_order,
+                    "icon": old_cat.icon,
+                    "color": old_cat.color,
+                    "is_active": old_cat.is_active,
+                    "target_margin": old_cat.target_margin,
+                    "minimum_margin": old_cat.minimum_margin
+                }
+                for old_cat in old_categories
+            ]
         )
-        db.add(new_prod)
-        await db.flush()
+        category_mapping = dict(zip((c.id for c in old_categories), new_category_ids))
 
-        # Create branch stock for this tenant (preserving current stock quantity)
-        branch_stock = BranchStock(
-            tenant_id=current_tenant.id,
-            org_product_id=new_prod.id,
-            quantity=old_prod.quantity,
-            override_selling_price=None  # Use org-level price
+    # Copy products - stream only the needed columns in chunks and keep
+    # just the insert rows, so a large catalog never sits in memory
+    product_rows = []
+    result = await db.stream(
+        select(
+            Product.name,
+            Product.sku,
+            Product.description,
+            Product.base_cost,
+            Product.selling_price,
+            Product.target_margin,
+            Product.minimum_margin,
+            Product.category_id,
+            Product.unit,
+            Product.image_url,
+            Product.reorder_level,
+            Product.is_available,
+            Product.is_service
         )
-        db.add(branch_stock)
-        migrated_product_count += 1
+        .where(Product.tenant_id == current_tenant.id)
+        .execution_options(yield_per=1000)
+    )
+    async for old_prod in result:
+        # Organization product (category ID mapped to the new one)
+        product_rows.append({
+            "organization_id": new_org.id,
+            "name": old_prod.name,
+            "sku": old_prod.sku,
+            "description": old_prod.description,
+            "base_cost": old_prod.base_cost,
+            "selling_price": old_prod.selling_price,
+            "target_margin": old_prod.target_margin,
+            "minimum_margin": old_prod.minimum_margin,
+            "category_id": category_mapping.get(old_prod.category_id),
+            "unit": old_prod.unit,
+            "image_url": old_prod.image_url,
+            "reorder_level": old_prod.reorder_level,
+            "is_available": old_prod.is_available,
+            "is_service": old_prod.is_service
+        })
+    migrated_product_count = len(product_rows)
+
+    if product_rows:
+        await _insert_returning_ids(db, OrganizationProduct, product_rows)
 
     # Update tenant to become a branch
     current_tenant.organization_id = new_org.id
     current_tenant.branch_type = 'branch'
-    current_tenant.updated_at = datetime.utcnow()
-
-    # Delete old products and categories (data now in org tables)
-    await db.execute(
-        delete(Product).where(Product.tenant_id == current_tenant.id)
-    )
-    await db.execute(
-        delete(Category).where(Category.tenant_id == current_tenant.id)
-    )
 
     await db.commit()
-    await db.refresh(new_org)
-    await db.refresh(current_tenant)
 
     # Build response
     org_response = OrganizationResponse(
@@ -1031,15 +1103,26 @@ async def list_branches(
     # Find main tenant (could be current or parent)
     main_tenant_id = current_tenant.parent_tenant_id or current_tenant.id
 
-    # Get all branches for this business
+    # Get all branches for this business (only the BranchResponse columns)
     result = await db.execute(
-        select(Tenant)
+        select(
+            Tenant.id,
+            Tenant.name,
+            Tenant.subdomain,
+            Tenant.slug,
+            Tenant.parent_tenant_id,
+            Tenant.organization_id,
+            Tenant.is_active,
+            Tenant.created_at,
+            Tenant.logo_url,
+            Tenant.phone,
+            Tenant.address
+        )
         .where(Tenant.parent_tenant_id == main_tenant_id)
         .order_by(Tenant.created_at)
     )
-    branches = result.scalars().all()
 
-    return branches
+    return result.mappings().all()
 
 
 @router.post("/me/branches", response_model=BranchResponse, status_code=status.HTTP_201_CREATED)
@@ -1072,22 +1155,26 @@ async def create_branch(
     # Auto-generate subdomain from name
     base_subdomain = branch_data.name.lower().replace(' ', '-').replace('_', '-')
     # Remove special characters, keep only alphanumeric and hyphens
-    import re
-    base_subdomain = re.sub(r'[^a-z0-9-]', '', base_subdomain)
+    base_subdomain = _SUBDOMAIN_STRIP.sub('', base_subdomain)
     # Remove multiple consecutive hyphens
-    base_subdomain = re.sub(r'-+', '-', base_subdomain)
+    base_subdomain = _SUBDOMAIN_COLLAPSE.sub('-', base_subdomain)
     # Remove leading/trailing hyphens
     base_subdomain = base_subdomain.strip('-')[:30]
+    if not base_subdomain:
+        # Name had no usable characters (all punctuation or non-Latin) - derive
+        # from the main location instead of matching every subdomain below
+        base_subdomain = f"{current_tenant.subdomain[:23]}-branch"
+
+    # Ensure uniqueness by adding suffix if needed - fetch every taken
+    # candidate in one query (base has no LIKE wildcards after cleaning)
+    result = await db.execute(
+        select(Tenant.subdomain).where(Tenant.subdomain.like(f"{base_subdomain}%"))
+    )
+    taken = set(result.scalars().all())
 
-    # Ensure uniqueness by adding suffix if needed
     subdomain = base_subdomain
     counter = 1
-    while True:
-        result = await db.execute(
-            select(Tenant).where(Tenant.subdomain == subdomain)
-        )
-        if not result.scalar_one_or_none():
-            break
+    while subdomain in taken:
         subdomain = f"{base_subdomain}-{counter}"
         counter += 1
 
@@ -1122,23 +1209,22 @@ async def create_branch(
     )
 
     # Copy all products from main business to branch stock (quantity=0)
+    # with a single INSERT ... SELECT, so no product rows leave the database
     main_tenant_id = current_tenant.parent_tenant_id or current_tenant.id
-    result = await db.execute(
-        select(Product).where(Product.tenant_id == main_tenant_id)
-    )
-    products = result.scalars().all()
-
-    for product in products:
-        branch_stock = BranchStock(
-            tenant_id=new_branch.id,
-            product_id=product.id,
-            quantity=0,  # Start with 0 stock
-            override_selling_price=None
+    await db.execute(
+        insert(BranchStock).from_select(
+            ["tenant_id", "product_id", "quantity", "override_selling_price"],
+            select(
+                literal(new_branch.id),
+                Product.id,
+                literal(0),  # Start with 0 stock
+                null()
+            ).where(Product.tenant_id == main_tenant_id)
         )
-        db.add(branch_stock)
+    )
 
     await db.commit()
-    await db.refresh(new_branch)
+    invalidate_subdomain_cache(subdomain)
 
     return new_branch
 
@@ -1172,14 +1258,63 @@ async def update_branch(
     for key, value in updates.model_dump(exclude_unset=True).items():
         setattr(branch, key, value)
 
-    branch.updated_at = datetime.utcnow()
-
     await db.commit()
-    await db.refresh(branch)
 
     return branch
 
 
+async def _get_branch_with_data_flag(db: AsyncSession, branch_id: int, main_tenant_id: int):
+    """
+    Load a branch of this business together with whether it has any sales,
+    products or stock movements, in a single query. EXISTS stops at the
+    first row, and the OR is evaluated left to right so a branch with sales
+    never probes products or stock movements. Returns (None, False) if the
+    branch isn't found.
+    """
+    result = await db.execute(
+        select(
+            Tenant,
+            or_(
+                exists().where(Sale.tenant_id == branch_id),
+                exists().where(Product.tenant_id == branch_id),
+                exists().where(
+                    StockMovement.product_id == Product.id,
+                    Product.tenant_id == branch_id
+                )
+            ).label('has_data')
+        )
+        .where(
+            Tenant.id == branch_id,
+            Tenant.parent_tenant_id == main_tenant_id
+        )
+    )
+    row = result.one_or_none()
+    if row is None:
+        return None, False
+    return row.Tenant, bool(row.has_data)
+
+
+async def _branch_data_counts(db: AsyncSession, branch_id: int):
+    """Count a branch's sales, products and stock movements with a single query"""
+    result = await db.execute(
+        select(
+            select(func.count(Sale.id))
+            .where(Sale.tenant_id == branch_id)
+            .scalar_subquery(),
+            select(func.count(Product.id))
+            .where(Product.tenant_id == branch_id)
+            .scalar_subquery(),
+            select(func.count(StockMovement.id))
+            .select_from(StockMovement)
+            .join(Product, StockMovement.product_id == Product.id)
+            .where(Product.tenant_id == branch_id)
+            .scalar_subquery()
+        )
+    )
+    sales_count, products_count, stock_movements_count = result.one()
+    return sales_count or 0, products_count or 0, stock_movements_count or 0
+
+
 @router.get("/me/branches/{branch_id}/can-delete")
 async def check_branch_can_delete(
     branch_id: int,
@@ -1192,38 +1327,17 @@ async def check_branch_can_delete(
     # Find main tenant (could be current or parent)
     main_tenant_id = current_tenant.parent_tenant_id or current_tenant.id
 
-    # Get branch and verify it belongs to this business
-    result = await db.execute(
-        select(Tenant).where(
-            Tenant.id == branch_id,
-            Tenant.parent_tenant_id == main_tenant_id
-        )
-    )
-    branch = result.scalar_one_or_none()
+    # Get branch (verifying it belongs to this business) and whether it has data
+    branch, has_data = await _get_branch_with_data_flag(db, branch_id, main_tenant_id)
 
     if not branch:
         raise HTTPException(404, detail="Branch not found or does not belong to your business")
 
-    # Check if branch has any data
-    sales_result = await db.execute(
-        select(func.count(Sale.id)).where(Sale.tenant_id == branch_id)
-    )
-    sales_count = sales_result.scalar() or 0
-
-    products_result = await db.execute(
-        select(func.count(Product.id)).where(Product.tenant_id == branch_id)
-    )
-    products_count = products_result.scalar() or 0
-
-    stock_movements_result = await db.execute(
-        select(func.count(StockMovement.id))
-        .select_from(StockMovement)
-        .join(Product, StockMovement.product_id == Product.id)
-        .where(Product.tenant_id == branch_id)
-    )
-    stock_movements_count = stock_movements_result.scalar() or 0
-
-    has_data = sales_count > 0 or products_count > 0 or stock_movements_count > 0
+    # Only count rows when there are some
+    if has_data:
+        sales_count, products_count, stock_movements_count = await _branch_data_counts(db, branch_id)
+    else:
+        sales_count = products_count = stock_movements_count = 0
 
     return {
         "can_delete": not has_data,
@@ -1249,40 +1363,19 @@ async def delete_branch(
     # Find main tenant (could be current or parent)
     main_tenant_id = current_tenant.parent_tenant_id or current_tenant.id
 
-    # Get branch and verify it belongs to this business
-    result = await db.execute(
-        select(Tenant).where(
-            Tenant.id == branch_id,
-            Tenant.parent_tenant_id == main_tenant_id
-        )
-    )
-    branch = result.scalar_one_or_none()
+    # Get branch (verifying it belongs to this business) and whether it has data
+    branch, has_data = await _get_branch_with_data_flag(db, branch_id, main_tenant_id)
 
     if not branch:
         raise HTTPException(404, detail="Branch not found or does not belong to your business")
 
     branch_name = branch.name
 
-    # Check if branch has any data
-    sales_result = await db.execute(
-        select(func.count(Sale.id)).where(Sale.tenant_id == branch_id)
-    )
-    sales_count = sales_result.scalar() or 0
-
-    products_result = await db.execute(
-        select(func.count(Product.id)).where(Product.tenant_id == branch_id)
-    )
-    products_count = products_result.scalar() or 0
-
-    stock_movements_result = await db.execute(
-        select(func.count(StockMovement.id))
-        .select_from(StockMovement)
-        .join(Product, StockMovement.product_id == Product.id)
-        .where(Product.tenant_id == branch_id)
-    )
-    stock_movements_count = stock_movements_result.scalar() or 0
-
-    has_data = sales_count > 0 or products_count > 0 or stock_movements_count > 0
+    # Only count rows when there are some
+    if has_data:
+        sales_count, products_count, stock_movements_count = await _branch_data_counts(db, branch_id)
+    else:
+        sales_count = products_count = stock_movements_count = 0
 
     if has_data:
         # Branch has data - only deactivate
@@ -1305,6 +1398,7 @@ async def delete_branch(
             delete(Tenant).where(Tenant.id == branch_id)
         )
         await db.commit()
+        invalidate_subdomain_cache(branch.subdomain)
 
         return {
             "message": f"Branch '{branch_name}' permanently deleted",
@@ -1323,13 +1417,26 @@ async def check_subdomain_availability(
     db: AsyncSession = Depends(get_db)
 ):
     """PUBLIC ENDPOINT: Check if subdomain is available"""
-    tenant = await get_tenant_from_subdomain(subdomain, db)
+    tenant_id = await get_tenant_id_from_subdomain(subdomain, db)
     return {
         "subdomain": subdomain,
-        "available": tenant is None
+        "available": tenant_id is None
     }
 
 
+@router.post("/check-subdomains")
+async def check_subdomains_availability(
+    request: SubdomainAvailabilityRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """PUBLIC ENDPOINT: Check several candidate subdomains in one query"""
+    result = await db.execute(
+        select(Tenant.subdomain).where(Tenant.subdomain.in_(request.subdomains))
+    )
+    taken = set(result.scalars().all())
+    return {subdomain: subdomain not in taken for subdomain in request.subdomains}
+
+
 @router.get("/my-tenants", response_model=List[TenantSummary])
 async def list_my_tenants(
     current_user: User = Depends(get_current_active_user),
@@ -1337,10 +1444,17 @@ async def list_my_tenants(
 ):
     """List all tenants the current user has access to"""
     result = await db.execute(
-        select(Tenant)
-        .join(tenant_users)
+        select(
+            Tenant.id,
+            Tenant.name,
+            Tenant.subdomain,
+            Tenant.slug,
+            Tenant.is_active,
+            Tenant.logo_url
+        )
+        .join(tenant_users, tenant_users.c.tenant_id == Tenant.id)
         .where(tenant_users.c.user_id == current_user.id)
         .where(tenant_users.c.is_active == True)
         .where(Tenant.is_active == True)
     )
-    return result.scalars().all()
+    return [TenantSummary.model_construct(**row._mapping) for row in result]
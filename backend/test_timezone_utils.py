@@ -0,0 +1,59 @@
+"""
+Test script to verify tenant timezone helpers handle missing/invalid zones.
+
+Tenant.timezone is nullable, so every helper must fall back to UTC instead
+of raising for None, empty or unknown zone names.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python test_timezone_utils.py
+"""
+from datetime import datetime, timezone
+
+from timezone_utils import (
+    get_tenant_timezone,
+    get_tenant_today,
+    get_tenant_date_range,
+    utc_to_tenant_date,
+    utc_to_tenant_dates,
+    format_tenant_datetime,
+)
+
+failures = 0
+
+
+def check(label, condition):
+    global failures
+    if condition:
+        print(f"   ✅ PASSED: {label}")
+    else:
+        failures += 1
+        print(f"   ❌ FAILED: {label}")
+
+
+print("=" * 70)
+print("TENANT TIMEZONE FALLBACKS")
+print("=" * 70)
+
+sample = datetime(2026, 1, 26, 22, 30)
+
+for name in (None, "", "Not/AZone"):
+    print(f"\nTimezone {name!r}:")
+    check("falls back to UTC", get_tenant_timezone(name) is timezone.utc)
+    start, end = get_tenant_date_range(1, name)
+    check("today range starts at UTC midnight", (start.hour, start.minute) == (0, 0))
+    check("7-day range covers 7 days", (end - get_tenant_date_range(7, name)[0]).days == 6)
+    check("today resolves", get_tenant_today(name) == datetime.now(timezone.utc).date())
+    check("date conversion uses UTC", utc_to_tenant_date(sample, name) == sample.date())
+    check("batch conversion uses UTC", utc_to_tenant_dates([sample], name) == [sample.date()])
+    check("formats in UTC", format_tenant_datetime(sample, name) == "2026-01-26 22:30:00 UTC")
+
+print("\nTimezone 'Africa/Nairobi':")
+check("date conversion shifts to EAT", utc_to_tenant_date(sample, "Africa/Nairobi").day == 27)
+check("formats in EAT", format_tenant_datetime(sample, "Africa/Nairobi") == "2026-01-27 01:30:00 EAT")
+
+print("\n" + "=" * 70)
+print("ALL CHECKS PASSED" if not failures else f"{failures} CHECK(S) FAILED")
+print("=" * 70)
+exit(1 if failures else 0)
@@ -5,29 +5,89 @@ Converts UTC timestamps to tenant's local timezone for accurate date filtering.
 Solves the issue where sales made at 1 AM Kenya time appear on the previous day
 when grouped by UTC dates on Render deployment.
 """
-from datetime import datetime, date, timedelta
-from typing import Optional
-import pytz
+from datetime import datetime, date, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import Iterable, Optional
+import time
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
+_UTC = timezone.utc
+_DEFAULT_TZ_NAME = "Africa/Nairobi"
+_DEFAULT_TZ = ZoneInfo(_DEFAULT_TZ_NAME)
+_TENANT_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S %Z"
 
-def get_tenant_timezone(tenant_timezone: str = "Africa/Nairobi") -> pytz.timezone:
+
+def get_tenant_timezone(tenant_timezone: Optional[str] = _DEFAULT_TZ_NAME) -> tzinfo:
     """
-    Get pytz timezone object for tenant.
+    Get timezone object for tenant.
+
+    Memoized per timezone string - tenants share a handful of zones, so
+    report loops reuse the same tzinfo instead of resolving it per row.
+    Unknown names are cached with their UTC fallback too.
     
     Args:
-        tenant_timezone: Timezone string (e.g., "Africa/Nairobi")
+        tenant_timezone: Timezone string (e.g., "Africa/Nairobi"), may be None
         
     Returns:
-        pytz timezone object
+        ZoneInfo timezone object (UTC for unknown or missing names)
     """
+    # Nearly every tenant uses the default zone - skip even the cache lookup
+    if tenant_timezone == _DEFAULT_TZ_NAME:
+        return _DEFAULT_TZ
+    return _resolve_timezone(tenant_timezone)
+
+
+@lru_cache(maxsize=64)
+def _resolve_timezone(tenant_timezone: Optional[str]) -> tzinfo:
     try:
-        return pytz.timezone(tenant_timezone)
-    except pytz.exceptions.UnknownTimeZoneError:
-        # Fallback to UTC if invalid timezone
-        return pytz.UTC
+        return ZoneInfo(tenant_timezone)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        # Fallback to UTC if invalid timezone (Tenant.timezone is nullable,
+        # and ZoneInfo raises TypeError rather than a lookup error for None)
+        return _UTC
+
+
+# ==================== TENANT CLOCK CACHE ====================
+# "Today" and the date ranges only change when the minute changes - every
+# zone's UTC offset is a whole number of minutes, so local midnight always
+# lands on a minute boundary. Caching per (zone, minute) lets the many
+# date-filtered queries in one request (and across requests) share one result.
+
+def _minute_bucket() -> int:
+    return int(time.time() // 60)
+
+
+@lru_cache(maxsize=128)
+def _tenant_today(tenant_timezone: str, minute_bucket: int) -> date:
+    tz = get_tenant_timezone(tenant_timezone)
+    return datetime.now(tz).date()
+
+
+@lru_cache(maxsize=128)
+def _tenant_date_range(days: int, tenant_timezone: str, minute_bucket: int) -> tuple[datetime, datetime]:
+    tz = get_tenant_timezone(tenant_timezone)
+    
+    # Get current time in tenant's timezone
+    local_now = datetime.now(tz)
+    
+    # Get start of today in tenant's timezone. ZoneInfo resolves the UTC
+    # offset from the wall time, so midnight gets its own offset on DST days.
+    local_today_start = datetime.combine(local_now.date(), datetime.min.time(), tzinfo=tz)
+    
+    # Calculate start date (days ago)
+    local_start = local_today_start - timedelta(days=days - 1)
+    
+    # End is end of today in tenant's timezone
+    local_end = local_today_start + timedelta(days=1, microseconds=-1)
+    
+    # Convert back to UTC for database queries
+    start_utc = local_start.astimezone(timezone.utc).replace(tzinfo=None)
+    end_utc = local_end.astimezone(timezone.utc).replace(tzinfo=None)
+    
+    return start_utc, end_utc
 
 
-def get_tenant_today(tenant_timezone: str = "Africa/Nairobi") -> date:
+def get_tenant_today(tenant_timezone: str = _DEFAULT_TZ_NAME) -> date:
     """
     Get current date in tenant's timezone.
     
@@ -40,13 +100,10 @@ def get_tenant_today(tenant_timezone: str = "Africa/Nairobi") -> date:
     Returns:
         Current date in tenant's timezone
     """
-    tz = get_tenant_timezone(tenant_timezone)
-    utc_now = datetime.utcnow().replace(tzinfo=pytz.UTC)
-    local_now = utc_now.astimezone(tz)
-    return local_now.date()
+    return _tenant_today(tenant_timezone, _minute_bucket())
 
 
-def get_tenant_date_range(days: int, tenant_timezone: str = "Africa/Nairobi") -> tuple[datetime, datetime]:
+def get_tenant_date_range(days: int, tenant_timezone: str = _DEFAULT_TZ_NAME) -> tuple[datetime, datetime]:
     """
     Get date range in tenant's timezone.
     
@@ -65,29 +122,10 @@ def get_tenant_date_range(days: int, tenant_timezone: str = "Africa/Nairobi") ->
     Returns:
         Tuple of (start_datetime_utc, end_datetime_utc)
     """
-    tz = get_tenant_timezone(tenant_timezone)
-    
-    # Get current time in tenant's timezone
-    utc_now = datetime.utcnow().replace(tzinfo=pytz.UTC)
-    local_now = utc_now.astimezone(tz)
-    
-    # Get start of today in tenant's timezone
-    local_today_start = tz.localize(datetime.combine(local_now.date(), datetime.min.time()))
-    
-    # Calculate start date (days ago)
-    local_start = local_today_start - timedelta(days=days - 1)
-    
-    # End is end of today in tenant's timezone
-    local_end = local_today_start + timedelta(days=1) - timedelta(microseconds=1)
-    
-    # Convert back to UTC for database queries
-    start_utc = local_start.astimezone(pytz.UTC).replace(tzinfo=None)
-    end_utc = local_end.astimezone(pytz.UTC).replace(tzinfo=None)
-    
-    return start_utc, end_utc
+    return _tenant_date_range(days, tenant_timezone, _minute_bucket())
 
 
-def utc_to_tenant_date(utc_datetime: datetime, tenant_timezone: str = "Africa/Nairobi") -> date:
+def utc_to_tenant_date(utc_datetime: datetime, tenant_timezone: str = _DEFAULT_TZ_NAME) -> date:
     """
     Convert UTC datetime to date in tenant's timezone.
     
@@ -104,14 +142,34 @@ def utc_to_tenant_date(utc_datetime: datetime, tenant_timezone: str = "Africa/Na
     
     # Ensure datetime is timezone-aware
     if utc_datetime.tzinfo is None:
-        utc_datetime = utc_datetime.replace(tzinfo=pytz.UTC)
+        utc_datetime = utc_datetime.replace(tzinfo=_UTC)
     
     # Convert to tenant's timezone
     local_datetime = utc_datetime.astimezone(tz)
     return local_datetime.date()
 
 
-def format_tenant_datetime(utc_datetime: datetime, tenant_timezone: str = "Africa/Nairobi") -> str:
+def utc_to_tenant_dates(utc_datetimes: Iterable[datetime], tenant_timezone: str = _DEFAULT_TZ_NAME) -> list[date]:
+    """
+    Batch version of utc_to_tenant_date for grouping many sales at once.
+    
+    Resolves the tenant's timezone once for the whole batch instead of per row.
+    
+    Args:
+        utc_datetimes: UTC datetimes (naive or aware)
+        tenant_timezone: Timezone string
+        
+    Returns:
+        Dates in tenant's timezone, in input order
+    """
+    tz = get_tenant_timezone(tenant_timezone)
+    return [
+        (dt if dt.tzinfo is not None else dt.replace(tzinfo=_UTC)).astimezone(tz).date()
+        for dt in utc_datetimes
+    ]
+
+
+def format_tenant_datetime(utc_datetime: datetime, tenant_timezone: str = _DEFAULT_TZ_NAME) -> str:
     """
     Format UTC datetime as string in tenant's timezone.
     
@@ -122,10 +180,15 @@ def format_tenant_datetime(utc_datetime: datetime, tenant_timezone: str = "Afric
     Returns:
         Formatted datetime string (e.g., "2026-01-26 14:30:00 EAT")
     """
-    tz = get_tenant_timezone(tenant_timezone)
-    
     if utc_datetime.tzinfo is None:
-        utc_datetime = utc_datetime.replace(tzinfo=pytz.UTC)
+        utc_datetime = utc_datetime.replace(tzinfo=_UTC)
     
-    local_datetime = utc_datetime.astimezone(tz)
-    return local_datetime.strftime("%Y-%m-%d %H:%M:%S %Z")
+    # The format has whole-second precision, so key the cache on epoch seconds
+    return _format_epoch_seconds(int(utc_datetime.timestamp() // 1), tenant_timezone)
+
+
+@lru_cache(maxsize=1024)
+def _format_epoch_seconds(epoch_seconds: int, tenant_timezone: str) -> str:
+    # Grouped reports and receipts repeat the same timestamps - a hit skips strftime
+    tz = get_tenant_timezone(tenant_timezone)
+    return datetime.fromtimestamp(epoch_seconds, tz).strftime(_TENANT_DATETIME_FORMAT)
@@ -26,6 +26,12 @@ export function BusinessLogo({
       return `/api/uploads/${logoUrl}`;
     }
 
+    // Let Cloudflare resize the original on demand
+    if (size === 'display' && import.meta.env.VITE_R2_IMAGE_RESIZING === 'true') {
+      const origin = new URL(r2BaseUrl).origin;
+      return `${origin}/cdn-cgi/image/width=400,quality=85,format=auto/${r2BaseUrl}/${logoUrl}`;
+    }
+
     // Add variant suffix to filename (unless original)
     const suffix = size === 'original' ? '' : '_display';
     const path = logoUrl.replace(/\.(\w+)$/, `${suffix}.$1`);
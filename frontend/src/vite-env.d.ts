@@ -2,6 +2,7 @@
 
 interface ImportMetaEnv {
   readonly VITE_R2_PUBLIC_URL: string;
+  readonly VITE_R2_IMAGE_RESIZING?: string;
 }
 
 interface ImportMeta {